@@ -2,4 +2,17 @@ from faststream.rabbit import RabbitBroker
 from django.conf import settings
 from loguru import logger
 
-broker = RabbitBroker(settings.BROKER.uri, logger=logger)
+from core.broker.concurrency import KeyedLimiter
+
+broker = RabbitBroker(
+    settings.BROKER.uri,
+    logger=logger,
+    max_consumers=settings.BROKER.max_consumers,
+)
+
+# Handlers doing database work, each holds a connection of the pool while it
+# runs, so no more of them run than the pool can serve.
+consumer_limiter = KeyedLimiter(max(1, min(
+    settings.BROKER.concurrency,
+    settings.DATABASES["default"]["OPTIONS"]["pool"]["max_size"],
+)))
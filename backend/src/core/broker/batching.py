@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, Optional, TypeVar
+
+from loguru import logger
+
+__all__ = ("MessageBatcher",)
+
+T = TypeVar("T")
+
+
+class MessageBatcher(Generic[T]):
+    """Collects messages from concurrently running handlers and flushes them
+    together once `max_size` items are pending or `max_wait` seconds passed.
+
+    `submit` returns only after the batch holding the message was flushed and
+    re-raises the flush error, so the broker acks a message only after commit.
+    A failed batch is split and flushed again until the failing messages are
+    alone, the others are still stored. Flushes run one at a time.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list[T]], Awaitable[Any]],
+        *,
+        max_size: int,
+        max_wait: float,
+    ) -> None:
+        self.flush = flush
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._messages: list[T] = []
+        self._waiters: list[asyncio.Future] = []
+        self._size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, message: T, size: int = 1) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._messages.append(message)
+        self._waiters.append(waiter)
+        self._size += size
+        if self._size >= self.max_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait, self._schedule_flush
+            )
+        await waiter
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._messages:
+            return
+        messages, waiters = self._messages, self._waiters
+        self._messages, self._waiters, self._size = [], [], 0
+        task = asyncio.create_task(self._flush(messages, waiters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, messages: list[T], waiters: list[asyncio.Future]) -> None:
+        # One flush at a time keeps the messages of an account in order.
+        async with self._lock:
+            await self._flush_part(messages, waiters)
+
+    async def _flush_part(
+        self, messages: list[T], waiters: list[asyncio.Future]
+    ) -> None:
+        """Flush `messages`, on failure each half again, so only the messages
+        that fail on their own get the error."""
+        try:
+            await self.flush(messages)
+        except Exception as e:
+            if len(messages) > 1:
+                logger.warning(
+                    f"Flush of {len(messages)} messages failed, splitting: {e}"
+                )
+                middle = len(messages) // 2
+                await self._flush_part(messages[:middle], waiters[:middle])
+                await self._flush_part(messages[middle:], waiters[middle:])
+                return
+            logger.error(f"Flush of a message failed: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
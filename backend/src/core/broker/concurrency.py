@@ -0,0 +1,35 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+__all__ = ("KeyedLimiter",)
+
+
+class KeyedLimiter:
+    """Lets at most `limit` handlers run at once, while handlers sharing a key
+    run one after another in arrival order.
+
+    Example:
+        async with limiter.acquire(data["account_id"]):
+            ...
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self._locks: dict[Hashable, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._waiting: dict[Hashable, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        self._waiting[key] += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, which keeps the order
+            # of messages with the same key.
+            async with self._locks[key], self._semaphore:
+                yield
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key], self._locks[key]
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Iterable, Mapping, Optional, TypeVar
+
+__all__ = ("LRUCache", "TTLCache")
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Bounded in-process mapping that evicts the least recently used keys.
+    Safe to share between the event loop and worker threads."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_many(self, keys: Iterable[K]) -> dict[K, V]:
+        """Return the cached subset of `keys`, counting hits and misses."""
+        found: dict[K, V] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def set_many(self, values: Mapping[K, V]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TTLCache(LRUCache[K, V]):
+    """`LRUCache` whose entries expire `ttl` seconds after they were set."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self._expires: dict[K, float] = {}
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            if key in self._data and self._expires[key] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def get_many(self, keys: Iterable[K]) -> dict[K, V]:
+        return {key: value for key in keys if (value := self.get(key)) is not None}
+
+    def set_many(self, values: Mapping[K, V]) -> None:
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+                self._expires[key] = expires
+            while len(self._data) > self.maxsize:
+                key, _ = self._data.popitem(last=False)
+                del self._expires[key]
+
+    def set(self, key: K, value: V) -> None:
+        self.set_many({key: value})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
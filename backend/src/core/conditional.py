@@ -0,0 +1,56 @@
+"""
+Conditional GET for read endpoints.
+The ETag of a response is derived from the request and the version counters
+of the data it is built from, so it is known before touching that data:
+a client sending it back in `If-None-Match` gets a 304 right away, others may
+get the response built for the same ETag from an in-process cache.
+"""
+import hashlib
+from typing import Any, Awaitable, Callable, TypeVar
+
+from django.conf import settings
+from fastapi import Response, status
+
+from core.cache import LRUCache
+from core.utils import request
+
+__all__ = ("make_etag", "conditional", "response_cache")
+
+T = TypeVar("T")
+
+# Keys hold the versions, stale entries are never hit again and age out.
+response_cache: LRUCache[str, Any] = LRUCache(maxsize=settings.RESPONSE_CACHE.size)
+
+
+def make_etag(*versions: Any) -> str:
+    """ETag of the current request for the data at `versions`, which include
+    the user for responses that depend on it."""
+    url = request().url
+    key = "|".join(map(str, (url.path, url.query, *versions)))
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+def _matches(etag: str) -> bool:
+    header = request().headers.get("if-none-match")
+    if header is None:
+        return False
+    return header.strip() == "*" or etag in (i.strip() for i in header.split(","))
+
+
+async def conditional(
+    response: Response, etag: str, build: Callable[[], Awaitable[T]]
+) -> T | Response:
+    """Answer with 304 if the client has `etag` already, otherwise with the
+    result of `build`, cached if `RESPONSE_CACHE.enabled`."""
+    if _matches(etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    response.headers["ETag"] = etag
+    if not settings.RESPONSE_CACHE.enabled:
+        return await build()
+    if cached := response_cache.get_many([etag]):
+        return cached[etag]
+    result = await build()
+    response_cache.set_many({etag: result})
+    return result
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import zlib
+from typing import Any, Awaitable, Callable, Optional
+
+import psycopg
+from loguru import logger
+
+__all__ = ("LeaderElection",)
+
+
+class LeaderElection:
+    """Elects one process out of the replicas sharing a database with a
+    session level advisory lock. The lock lives on a dedicated connection,
+    outside of Django's pool, and is released by Postgres if the process dies,
+    so another replica takes over on its next attempt."""
+
+    def __init__(self, uri: str, name: str) -> None:
+        self.uri = uri
+        self.name = name
+        self.key = zlib.crc32(name.encode())
+        self._connection: Optional[psycopg.AsyncConnection] = None
+        self._leader = False
+        # Jobs of several schedulers may ask at the same time.
+        self._lock = asyncio.Lock()
+
+    async def is_leader(self) -> bool:
+        """Try to take the lock unless it is held already."""
+        async with self._lock:
+            return await self._elect()
+
+    async def _elect(self) -> bool:
+        try:
+            if self._connection is None or self._connection.closed:
+                self._leader = False
+                self._connection = await psycopg.AsyncConnection.connect(
+                    self.uri, autocommit=True
+                )
+            if self._leader:
+                # A lost connection means a lost lock.
+                await self._connection.execute("SELECT 1")
+            else:
+                cursor = await self._connection.execute(
+                    "SELECT pg_try_advisory_lock(%s)", [self.key]
+                )
+                (self._leader,) = await cursor.fetchone()
+                if self._leader:
+                    logger.info(f"Elected as {self.name} leader")
+        except psycopg.Error as e:
+            logger.error(f"{self.name} leader election failed: {e}")
+            await self.release()
+        return self._leader
+
+    async def release(self) -> None:
+        self._leader = False
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def leader_only(
+        self, func: Callable[..., Awaitable[Any]]
+    ) -> Callable[..., Awaitable[Any]]:
+        """Wrap `func` to run only in the elected process."""
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if await self.is_leader():
+                return await func(*args, **kwargs)
+
+        return wrapper
@@ -1,7 +1,12 @@
+from typing import Callable, TypeVar
+
 from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
 from django.db.transaction import Atomic
 from django.db.models import Model
 
+T = TypeVar("T")
+
 
 class AsyncAtomicContextManager(Atomic):
     def __init__(self, using=None, savepoint=True, durable=False):
@@ -15,6 +20,22 @@ class AsyncAtomicContextManager(Atomic):
         await sync_to_async(super().__exit__)(exc_type, exc_value, traceback)
 
 
+async def atomic_in_thread(func: Callable[..., T], *args, **kwargs) -> T:
+    """Runs `func` in a transaction on a worker thread with its own connection.
+    `sync_to_async` calls share one thread and connection by default, so
+    concurrent `AsyncAtomicContextManager` blocks would mix their queries.
+    The connection is borrowed from the pool and returned once `func` ends."""
+
+    def run() -> T:
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
 class AsyncModelUtils:
     def __init__(self, model: type[Model], datasets: list[dict], unique_column: str):
         self.model = model
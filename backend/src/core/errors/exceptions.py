@@ -37,3 +37,12 @@ class UnhandledError(HTTPException):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             code="INTERNAL_SERVER_ERROR",
         )
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            message="Invalid pagination cursor",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            code="INVALID_CURSOR",
+        )
@@ -1,4 +1,11 @@
-from .query import paginate
-from .response import PageInfo, PaginationResponse, ParamsInput
+from .query import cursor_response, paginate
+from .response import CursorParamsInput, PageInfo, PaginationResponse, ParamsInput
 
-__all__ = ("paginate", "PaginationResponse", "PageInfo", "ParamsInput")
+__all__ = (
+    "paginate",
+    "cursor_response",
+    "PaginationResponse",
+    "PageInfo",
+    "ParamsInput",
+    "CursorParamsInput",
+)
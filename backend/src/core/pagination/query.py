@@ -1,8 +1,16 @@
-from typing import Any, Mapping, Optional
+import base64
+import binascii
+import functools
+import json
+from typing import Any, Literal, Mapping, Optional, Sequence
 
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db.models import Count, Q, QuerySet, Window
 from fastapi import Request
+from pydantic import TypeAdapter
 
+from core.cache import TTLCache
+from core.errors.exceptions import InvalidCursor
 from core.pagination.response import (
     PageInfo,
     PaginationResponse,
@@ -12,6 +20,78 @@ from core.pagination.response import (
 from core.utils import params_from_base, request
 
 
+CountMode = Literal["exact", "estimate"]
+
+count_cache: TTLCache[tuple, tuple[int, bool]] = TTLCache(
+    maxsize=settings.PAGINATION.count_cache_size,
+    ttl=settings.PAGINATION.count_cache_ttl,
+)
+
+
+# Window total selected with the page rows.
+TOTAL = "pagination_total"
+
+
+def _count_key(queryset: QuerySet, mode: CountMode) -> tuple:
+    sql, params = queryset.query.sql_with_params()
+    return mode, sql, repr(params)
+
+
+async def _known_total(
+        queryset: QuerySet, mode: CountMode
+) -> Optional[tuple[int, bool]]:
+    """Cached total or the planner estimate of a big result, `None` when the
+    rows must be counted."""
+    key = _count_key(queryset, mode)
+    if (cached := count_cache.get(key)) is not None:
+        return cached
+    if mode == "estimate":
+        plan = json.loads(await queryset.order_by().aexplain(format="json"))
+        rows = int(plan[0]["Plan"]["Plan Rows"])
+        if rows > settings.PAGINATION.estimate_threshold:
+            count_cache.set(key, (rows, True))
+            return rows, True
+    return None
+
+
+async def count_rows(queryset: QuerySet, mode: CountMode = "exact") -> tuple[int, bool]:
+    """Rows of `queryset` and whether the number is an estimate. The query
+    holds the user and the filters, totals are cached by it for a few seconds.
+    In `estimate` mode the planner estimate is used when it is above
+    `PAGINATION.estimate_threshold`, smaller results are still counted."""
+    if (known := await _known_total(queryset, mode)) is not None:
+        return known
+    total = await queryset.acount()
+    count_cache.set(_count_key(queryset, mode), (total, False))
+    return total, False
+
+
+async def _fetch(
+        queryset: QuerySet, start: int, stop: int, with_total: bool
+) -> tuple[list, Optional[int]]:
+    """Rows `start:stop` of `queryset` and, if `with_total`, the number of all
+    its rows from `count(*) OVER ()` in the same query. The total is unknown
+    when the slice is empty."""
+    if with_total:
+        queryset = queryset.annotate(**{TOTAL: Window(Count("*"))})
+    rows = [obj async for obj in queryset[start:stop]]
+    if not with_total or not rows:
+        return rows, None
+    for row in rows:
+        total = row.pop(TOTAL) if isinstance(row, dict) else getattr(row, TOTAL)
+    return rows, total
+
+
+@functools.cache
+def _adapter(schema: type[PublicSchema]) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+
+def _validate(schema: type[PublicSchema], rows: list) -> list:
+    """Validate the page in a single call instead of one per row."""
+    return _adapter(schema).validate_python(rows, from_attributes=True)
+
+
 def _update_path(
         req: Request, to_update: Optional[Mapping[str, Any]] = None
 ) -> str | None:
@@ -22,37 +102,203 @@ def _update_path(
     return str(url)
 
 
+def _json_default(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def encode_cursor(values: Sequence[Any], backward: bool = False) -> str:
+    """Opaque cursor pointing at the row with the keyset `values`."""
+    payload = json.dumps(
+        {"v": list(values), "b": backward}, default=_json_default, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple[list, bool]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        values, backward = payload["v"], payload["b"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor()
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor()
+    return values, bool(backward)
+
+
+def _reverse(key: str) -> str:
+    return key[1:] if key.startswith("-") else f"-{key}"
+
+
+def _after(keyset: Sequence[str], values: Sequence[Any]) -> Q:
+    """Rows strictly after `values` in the `keyset` order."""
+    names = [key.lstrip("-") for key in keyset]
+    ops = ["lt" if key.startswith("-") else "gt" for key in keyset]
+    condition = Q(**{f"{names[-1]}__{ops[-1]}": values[-1]})
+    for name, op, value in zip(names[-2::-1], ops[-2::-1], values[-2::-1]):
+        condition = Q(**{f"{name}__{op}": value}) | (Q(**{name: value}) & condition)
+    # Redundant, but lets the index scan start at the cursor instead of
+    # filtering every row before it.
+    return Q(**{f"{names[0]}__{ops[0]}e": values[0]}) & condition
+
+
+def _values(obj: Any, keyset: Sequence[str]) -> list:
+    names = [key.lstrip("-") for key in keyset]
+    if isinstance(obj, Mapping):
+        return [obj[name] for name in names]
+    return [getattr(obj, name) for name in names]
+
+
+async def _keyset_page(
+        queryset: QuerySet, params: ParamsInput, keyset: Sequence[str], with_total: bool
+) -> tuple[list, Optional[str], Optional[str], Optional[int]]:
+    limit = params.limit
+    total = None
+    cursor = getattr(params, "cursor", None)
+    if cursor:
+        values, backward = decode_cursor(cursor, len(keyset))
+        order = [_reverse(key) for key in keyset] if backward else list(keyset)
+        queryset = queryset.order_by(*order).filter(_after(order, values))
+        rows = [obj async for obj in queryset[:limit + 1]]
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        has_next, has_previous = (True, more) if backward else (more, True)
+    else:
+        # The first page may still be positioned by `page` and `skip`.
+        offset = (params.page - 1) * limit + (params.skip or 0)
+        rows, total = await _fetch(
+            queryset.order_by(*keyset), offset, offset + limit + 1, with_total
+        )
+        has_next, has_previous = len(rows) > limit, offset > 0
+        rows = rows[:limit]
+    if not rows:
+        return rows, None, None, total
+    next_cursor = previous_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(_values(rows[-1], keyset))
+    if has_previous:
+        previous_cursor = encode_cursor(_values(rows[0], keyset), backward=True)
+    return rows, next_cursor, previous_cursor, total
+
+
 async def paginate(
         queryset: QuerySet,
         params: ParamsInput,
-        schema: type[PublicSchema]
+        schema: type[PublicSchema],
+        keyset: Optional[Sequence[str]] = None,
+        count: CountMode = "exact",
 ) -> PaginationResponse:
     """Function to paginate a queryset.
-    On the future we can add more params to the function."""
+    With `keyset`, the ordering of the rows like `("-created_at", "-id")`, pages
+    are read through opaque cursors after the last row of the previous one, so
+    deep pages cost as much as the first. The last key must be unique and no
+    key may be null.
+    The total is skipped when the client sends `with_total=false`, see
+    `count_rows` for `count`."""
 
-    total = await queryset.acount()
+    total, estimated = None, False
+    if params.with_total and (known := await _known_total(queryset, count)):
+        total, estimated = known
+    # Otherwise the total comes with the rows.
+    count_in_page = params.with_total and total is None
 
     # Calculate the offset
     page, limit, skip = params.page, params.limit, params.skip or 0
     offset = (page - 1) * limit + skip
-    total_pages = (total + limit - 1) // limit
+
+    next_cursor = previous_cursor = None
+    if keyset is not None:
+        rows, next_cursor, previous_cursor, page_total = await _keyset_page(
+            queryset, params, keyset, count_in_page
+        )
+        next_page = {"cursor": next_cursor} if next_cursor else None
+        previous_page = {"cursor": previous_cursor} if previous_cursor else None
+    else:
+        # One extra row tells whether there is a next page without the total.
+        rows, page_total = await _fetch(
+            queryset, offset, offset + limit + 1, count_in_page
+        )
+        next_page = {"page": page + 1} if len(rows) > limit else None
+        previous_page = {"page": page - 1} if page > 1 else None
+        rows = rows[:limit]
+
+    if count_in_page:
+        if page_total is None:
+            # Cursor and empty pages can't tell it.
+            total, _ = await count_rows(queryset, count)
+        else:
+            total = page_total
+            count_cache.set(_count_key(queryset, count), (total, False))
+
+    return _response(
+        rows,
+        params,
+        schema,
+        total,
+        estimated,
+        next_page,
+        previous_page,
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+    )
+
+
+def _response(
+        rows: list,
+        params: ParamsInput,
+        schema: type[PublicSchema],
+        total: Optional[int],
+        estimated: bool,
+        next_page: Optional[Mapping[str, Any]],
+        previous_page: Optional[Mapping[str, Any]],
+        next_cursor: Optional[str] = None,
+        previous_cursor: Optional[str] = None,
+) -> PaginationResponse:
+    total_pages = None
+    if total is not None:
+        total_pages = (total + params.limit - 1) // params.limit
 
     # Create object `PageInfo`
     page_info = PageInfo(
         count=total_pages,
-        page=page,
-        limit=limit,
-        skip=skip,
-        next=_update_path(
-            req=request(), to_update={"page": page + 1} if page < total_pages else None
-        ),
-        previous=_update_path(
-            req=request(), to_update={"page": page - 1} if page > 1 else None
-        ),
+        page=params.page,
+        limit=params.limit,
+        skip=params.skip or 0,
+        with_total=params.with_total,
+        next=_update_path(req=request(), to_update=next_page),
+        previous=_update_path(req=request(), to_update=previous_page),
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+    )
+    return PaginationResponse(
+        total=total,
+        estimated=estimated,
+        data=_validate(schema, rows),
+        page_info=page_info,
+    )
+
+
+def cursor_response(
+        rows: list,
+        params: ParamsInput,
+        schema: type[PublicSchema],
+        next_cursor: Optional[str],
+        previous_cursor: Optional[str],
+        total: Optional[int] = None,
+        estimated: bool = False,
+) -> PaginationResponse:
+    """Response of a page read through cursors by the caller, for lists
+    `paginate` can't build a single queryset for."""
+    return _response(
+        rows,
+        params,
+        schema,
+        total,
+        estimated,
+        {"cursor": next_cursor} if next_cursor else None,
+        {"cursor": previous_cursor} if previous_cursor else None,
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
     )
-    async for obj in queryset[offset: offset + limit]:
-        print(obj)
-    data = [
-        schema.model_validate(obj) async for obj in queryset[offset: offset + limit]
-    ]
-    return PaginationResponse(total=total, data=data, page_info=page_info)
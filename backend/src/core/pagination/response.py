@@ -9,6 +9,14 @@ class ParamsInput(PublicSchema):
     page: int = Field(1, ge=1)
     limit: int = Field(100, ge=1, le=100)
     skip: Optional[int] = Field(0, ge=0)
+    with_total: bool = Field(True, title="Count the total, slower on big lists")
+
+
+class CursorParamsInput(ParamsInput):
+    """Params of the endpoints paginated by keyset, `page` only positions the
+    first page, the next ones are reached through the cursors."""
+
+    cursor: Optional[str] = Field(None, title="Cursor from `page_info`")
 
 
 class Page(ParamsInput):
@@ -18,9 +26,11 @@ class Page(ParamsInput):
 
 
 class PageInfo(ParamsInput):
-    count: int
+    count: Optional[int]
     next: Optional[str]
     previous: Optional[str]
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
 
 
 # _PublicSchema = TypeVar("_PublicSchema", bound=PublicSchema)
@@ -32,5 +42,6 @@ class PaginationResponse(
 ):
     """Base class for pagination responses."""
 
-    total: int
+    total: Optional[int]
+    estimated: bool = False
     page_info: _PageInfo
@@ -1,14 +1,24 @@
 import asyncio
 import os
-from typing import Callable
+from typing import Callable, Optional
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from loguru import logger
 
+from core.db.leader import LeaderElection
 
-async def setup_scheduler(cron: str, callback: Callable, timezone: str = "Europe/Paris"):
+
+async def setup_scheduler(
+        cron: str,
+        callback: Callable,
+        timezone: str = "Europe/Paris",
+        leader: Optional[LeaderElection] = None,
+):
+    """Run `callback` on `cron`, only in the elected process if `leader` is set."""
     scheduler = AsyncIOScheduler()
+    if leader is not None:
+        callback = leader.leader_only(callback)
 
     # Database dump task daily
     scheduler.add_job(callback, CronTrigger.from_crontab(cron, timezone=timezone))
@@ -1,14 +1,19 @@
 import asyncio
 from contextlib import asynccontextmanager
+
+from django.conf import settings
 from fastapi import APIRouter, FastAPI
 
 from core.broker import broker
+from core.db.leader import LeaderElection
 from core.scheduler import setup_scheduler
 from users.api.routers import router as users_router
 from users.registry import telegram_save_account  # noqa
 
 from social_media.api.routers import router as social_media_router
-from social_media.registry import save_posts, push_accounts  # noqa
+from social_media.engagement import maintain_partitions
+from social_media.outbox import outbox_relay
+from social_media.registry import save_posts, push_accounts, update_crawl_job  # noqa
 
 __all__ = (
     "routers",
@@ -25,6 +30,18 @@ routers: list[APIRouter] = [
 async def lifespan(application: FastAPI):
     async with broker:
         await broker.start()
-        task = asyncio.create_task(setup_scheduler(cron='*/2 * * * *', callback=push_accounts))
+        # Scheduled jobs run once per deployment, not once per API process.
+        leader = LeaderElection(settings.DATABASE.uri, name="scheduler")
+        await leader.leader_only(maintain_partitions)()
+        task = asyncio.create_task(setup_scheduler(
+            cron=settings.CRAWLER.cron, callback=push_accounts, leader=leader
+        ))
+        partitions = asyncio.create_task(setup_scheduler(
+            cron='0 3 * * *', callback=maintain_partitions, leader=leader
+        ))
+        relay = asyncio.create_task(outbox_relay.run())
         yield
+        relay.cancel()
+        partitions.cancel()
         task.cancel()
+        await leader.release()
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -24,6 +24,8 @@ class PublicApiSettings(BaseModel):
 
 class DatabaseSettings(BaseModel):
     uri: str
+    pool_size: int = 10  # connections one process may hold at once
+    pool_timeout: float = 30  # seconds to wait for a free connection
 
 
 class AccessTokenSettings(BaseModel):
@@ -45,6 +47,80 @@ class AuthenticationSettings(BaseModel):
 
 class RabbitMQSettings(BaseModel):
     uri: str
+    max_consumers: Optional[int] = None  # channel prefetch, unlimited if not set
+    concurrency: int = 4  # handlers running at once, capped by DATABASE__POOL_SIZE
+
+
+class IngestBatchSettings(BaseModel):
+    """Micro-batching of `instagram:posts:save` messages."""
+
+    enabled: bool = False
+    max_size: int = 500  # posts per transaction
+    max_wait_ms: int = 200
+
+
+class IngestSettings(BaseModel):
+    batch: IngestBatchSettings = IngestBatchSettings()
+    tag_cache_size: int = 50_000  # titles kept in the in-process tag id cache
+    tag_cache_ttl: int = 300  # seconds before a cached tag id is read again
+    follow_index_ttl: int = 60  # seconds before the followed tags index is rebuilt
+
+
+class OutboxSettings(BaseModel):
+    """Relay publishing the transactional outbox."""
+
+    batch_size: int = 500
+    poll_interval: float = 5  # seconds between polls when nothing woke the relay
+    lease: int = 60  # seconds a claimed message waits for confirm before retry
+
+
+class MetricsSettings(BaseModel):
+    """Monthly partitions of the post engagement history."""
+
+    partitions_ahead: int = 2  # future months created by the daily maintenance
+    retention_months: Optional[int] = None  # older months are dropped, keep if unset
+
+
+class PaginationSettings(BaseModel):
+    """Totals of the paginated endpoints."""
+
+    count_cache_ttl: float = 30  # seconds a total is reused for the same query
+    count_cache_size: int = 10_000  # totals kept in the in-process cache
+    estimate_threshold: int = 10_000  # planner estimates above it replace counts
+
+
+class ResponseCacheSettings(BaseModel):
+    """In-process cache of read responses keyed by their ETag."""
+
+    enabled: bool = False
+    size: int = 1000  # responses kept per process
+
+
+class FeedSettings(BaseModel):
+    """Fan-out on write of new posts to the feeds of the subscribers."""
+
+    fan_out: bool = False  # read feeds from `FeedEntry` rows written on ingest
+    max_entries: int = 1000  # newest posts kept in the feed of a user
+
+
+class CrawlerSettings(BaseModel):
+    """Adaptive scheduling of account crawls."""
+
+    cron: str = "* * * * *"  # how often due accounts are published
+    budget: int = 60  # crawler requests per provider and run
+    claim_size: int = 500  # accounts claimed per transaction
+    page_size: int = 10
+    max_pages: int = 1
+    min_interval: int = 120  # seconds between crawls of the most active accounts
+    max_interval: int = 86_400  # seconds between crawls of dormant accounts
+    job_lease: int = 3600  # seconds a queued crawl may wait for a crawler
+    running_lease: int = 600  # seconds a started crawl may take to send its result
+    retry_delay: int = 300  # seconds before the account of a failed crawl is due
+    job_retention: int = 86_400  # seconds finished crawl jobs are kept
+    backfill_pages: int = 50  # pages per backfill job, checkpointed page by page
+    backfill_budget: int = 10  # interrupted backfills resumed per run
+    posts_per_crawl: float = 1.0  # expected new posts that make an account due
+    rate_smoothing: float = 0.3  # weight of the latest crawl in the posting rate
 
 
 class Settings(BaseSettings):
@@ -63,6 +139,13 @@ class Settings(BaseSettings):
     PUBLIC_API: PublicApiSettings = Field(default_factory=PublicApiSettings)
     AUTHENTICATION: AuthenticationSettings = AuthenticationSettings()
     BROKER: RabbitMQSettings
+    INGEST: IngestSettings = IngestSettings()
+    OUTBOX: OutboxSettings = OutboxSettings()
+    METRICS: MetricsSettings = MetricsSettings()
+    CRAWLER: CrawlerSettings = CrawlerSettings()
+    PAGINATION: PaginationSettings = PaginationSettings()
+    RESPONSE_CACHE: ResponseCacheSettings = ResponseCacheSettings()
+    FEED: FeedSettings = FeedSettings()
 
     model_config = SettingsConfigDict(
         env_file=ROOT_PATH / ".env",
@@ -50,6 +50,16 @@ ASGI_APPLICATION = "server.asgi.application"  # noqa
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 DATABASES = {"default": dj_database_url.config(default=config.DATABASE.uri)}
+# Threads borrow connections from a per process pool and give them back when
+# Django closes them, so at most `DATABASE.pool_size` are ever opened.
+DATABASES["default"]["CONN_MAX_AGE"] = 0
+DATABASES["default"]["OPTIONS"] = {
+    "pool": {
+        "min_size": 1,
+        "max_size": config.DATABASE.pool_size,
+        "timeout": config.DATABASE.pool_timeout,
+    }
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
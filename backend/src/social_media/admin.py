@@ -1,5 +1,5 @@
 from django.contrib import admin
-from social_media.models import Account, Post, Tag, UserSubscription
+from social_media.models import Account, CrawlJob, Post, Tag, UserSubscription
 
 
 # Register your models here.
@@ -7,7 +7,9 @@ from social_media.models import Account, Post, Tag, UserSubscription
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
-    list_display = ("id", "username", "provider", "created_at")
+    list_display = (
+        "id", "username", "provider", "created_at", "post_rate", "next_crawl_at"
+    )
     list_filter = ("provider",)
     search_fields = ("username",)
 
@@ -30,3 +32,10 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
     list_display = ("id", "account", "user")
     list_filter = ("account",)
     search_fields = ("user",)
+
+
+@admin.register(CrawlJob)
+class CrawlJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "account", "kind", "status", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    raw_id_fields = ("account",)
@@ -11,6 +11,15 @@ class AccountNotFound(HTTPException):
         )
 
 
+class PostNotFound(HTTPException):
+    def __init__(self, post_id: int):
+        super().__init__(
+            message=f"Post with id '{post_id}' not found",
+            code="POST_NOT_FOUND",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+
+
 class AccountAlreadyExists(HTTPException):
     def __init__(self, username: str):
         super().__init__(
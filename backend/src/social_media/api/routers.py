@@ -1,24 +1,46 @@
-from typing import Annotated
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Optional
 
 from asgiref.sync import sync_to_async
+from django.db.models import Sum
 
 from fastapi import APIRouter, Depends, status, Path, Query
+from fastapi import Response as HTTPResponse
+from fastapi.responses import StreamingResponse
 
-from core.db.utils import AsyncAtomicContextManager, AsyncModelUtils
-from core.pagination import PageInfo, PaginationResponse, ParamsInput, paginate
+from core.conditional import conditional, make_etag
+from core.db.utils import AsyncAtomicContextManager
+from core.pagination import (
+    CursorParamsInput,
+    PageInfo,
+    PaginationResponse,
+    ParamsInput,
+    paginate,
+)
 from core.schemas import MessageResponse, Response, ResponseMulti
 
 from users.models import User
 from users.api.auth.security import user_auth
-from social_media.api.messages import AccountNotFound, AccountAlreadyExists, TagAlreadyExists
+from social_media.api.messages import (
+    AccountNotFound,
+    AccountAlreadyExists,
+    PostNotFound,
+    TagAlreadyExists,
+)
 from social_media.api.schemas import (
     AccountSchemaRequest,
     AccountSchemaResponse,
+    MetricPointSchema,
     PostSchemaResponse,
     TagSchemaRequest,
     TagSchemaResponse,
     TagCreateSchemaRequest
 )
+from social_media.crawling import crawl_first
+from social_media.engagement import Interval, account_series, post_series
+from social_media.export import MEDIA_TYPES, ExportFormat, export_posts
+from social_media.feed import feed_page
+from social_media.ingest import aresolve_tags
 from social_media.models import Account, Post, UserSubscription, Tag
 
 router = APIRouter(prefix="/social-media")
@@ -26,6 +48,10 @@ router = APIRouter(prefix="/social-media")
 AccountID = Annotated[int, Path(..., title="Account ID", alias="id", gt=0)]
 PostID = Annotated[int, Path(..., title="Post ID", alias="id", gt=0)]
 TagID = Annotated[int, Path(..., title="Tag ID", alias="id", gt=0)]
+Since = Annotated[
+    Optional[datetime], Query(title="Series start, 30 days ago by default")
+]
+Until = Annotated[Optional[datetime], Query(title="Series end, now by default")]
 
 
 @router.get('/providers', status_code=status.HTTP_200_OK, tags=["Providers"])
@@ -49,10 +75,10 @@ async def add_account(
         )
         if state is False:
             raise AccountAlreadyExists(body.username)
-        multi = AsyncModelUtils(Tag, [{"title": i} for i in body.tags], 'title')
-        tags = await multi.update_or_create()
-        await subscription.follow_tags.aset(tags)
+        tags = await aresolve_tags(set(body.tags))
+        await subscription.follow_tags.aset(tags.values())
         await subscription.asave()
+        await sync_to_async(crawl_first)(account)
     obj = await Account.extract(user=user).filter(id=account.id).afirst()
     return Response[AccountSchemaResponse](data=obj)
 
@@ -75,6 +101,7 @@ async def remove_account(account_id: AccountID):
 
 @router.get(path="/accounts", status_code=status.HTTP_200_OK, tags=["Accounts"])
 async def get_accounts(
+        response: HTTPResponse,
         q: str = Query(None, title="Search by username"),
         params: ParamsInput = Depends(),
         user: User = Depends(user_auth.get_current_user),
@@ -83,30 +110,136 @@ async def get_accounts(
     queryset = Account.extract(user=user, tags_limit=5)
     if q:
         queryset = queryset.filter(username__icontains=q)
-    return await paginate(queryset, params, AccountSchemaResponse)
+    etag = make_etag(user.id, user.data_version)
+    return await conditional(
+        response, etag, lambda: paginate(queryset, params, AccountSchemaResponse)
+    )
 
 
 @router.get(path='/accounts/{id}', status_code=status.HTTP_200_OK, tags=["Accounts"])
 async def get_account(
         account_id: AccountID,
+        response: HTTPResponse,
         user: User = Depends(user_auth.get_current_user)
 ) -> Response[AccountSchemaResponse]:
-    obj = await Account.extract(user=user).filter(id=account_id).afirst()
-    if obj is None:
-        raise AccountNotFound(account_id)
-    return Response[AccountSchemaResponse](data=obj)
+    async def build() -> Response[AccountSchemaResponse]:
+        obj = await Account.extract(user=user).filter(id=account_id).afirst()
+        if obj is None:
+            raise AccountNotFound(account_id)
+        return Response[AccountSchemaResponse](data=obj)
+
+    return await conditional(response, make_etag(user.id, user.data_version), build)
 
 
 @router.get(path="/accounts/{id}/posts", status_code=status.HTTP_200_OK, tags=["Posts"])
 async def get_posts(
         account_id: AccountID,
-        params: ParamsInput = Depends(),
+        response: HTTPResponse,
+        params: CursorParamsInput = Depends(),
         user: User = Depends(user_auth.get_current_user)
 ) -> PaginationResponse[PostSchemaResponse, PageInfo]:
+    """Newest posts first, follow `page_info.next` to read deeper pages"""
     queryset = Post.extract(user=user).filter(
         account_id=account_id,
     )
-    return await paginate(queryset, params, PostSchemaResponse)
+    version = await Account.objects.filter(id=account_id).values_list(
+        "version", flat=True
+    ).afirst()
+    etag = make_etag(user.id, user.data_version, version)
+    return await conditional(response, etag, lambda: paginate(
+        queryset,
+        params,
+        PostSchemaResponse,
+        keyset=("-created_at", "-id"),
+        count="estimate",
+    ))
+
+
+@router.get(path="/feed", status_code=status.HTTP_200_OK, tags=["Posts"])
+async def get_feed(
+        response: HTTPResponse,
+        tagged: bool = Query(False, title="Only posts carrying followed tags"),
+        params: CursorParamsInput = Depends(),
+        user: User = Depends(user_auth.get_current_user)
+) -> PaginationResponse[PostSchemaResponse, PageInfo]:
+    """Newest posts of all subscribed accounts, follow `page_info.next` to read
+    deeper pages"""
+    # Account versions only grow, their sum changes with any of them.
+    versions = await Account.objects.filter(subscriptions__user=user.id).aaggregate(
+        version=Sum("version")
+    )
+    etag = make_etag(user.id, user.data_version, versions["version"])
+    return await conditional(
+        response, etag, lambda: feed_page(user, params, tagged=tagged)
+    )
+
+
+@router.get(
+    path="/accounts/{id}/posts/export",
+    status_code=status.HTTP_200_OK,
+    tags=["Posts"],
+)
+async def export_account_posts(
+        account_id: AccountID,
+        format: ExportFormat = Query("ndjson", title="NDJSON lines or CSV"),
+        since: Optional[datetime] = Query(None, title="Posts created from"),
+        until: Optional[datetime] = Query(None, title="Posts created before"),
+        user: User = Depends(user_auth.get_current_user)
+) -> StreamingResponse:
+    """All posts of the account in one streamed response, newest first"""
+    subscribed = UserSubscription.objects.filter(user=user, account_id=account_id)
+    if not await subscribed.aexists():
+        raise AccountNotFound(account_id)
+    queryset = Post.extract(user=user).filter(account_id=account_id)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return StreamingResponse(
+        export_posts(queryset, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="posts-{account_id}.{format}"'
+        },
+    )
+
+
+@router.get(
+    path="/accounts/{id}/metrics",
+    status_code=status.HTTP_200_OK,
+    tags=["Accounts"],
+)
+async def get_account_metrics(
+        account_id: AccountID,
+        interval: Interval = Query("day", title="Bucket size"),
+        since: Since = None,
+        until: Until = None,
+        user: User = Depends(user_auth.get_current_user)
+) -> ResponseMulti[MetricPointSchema]:
+    """Total likes and comments of the account posts at the end of each bucket"""
+    subscribed = UserSubscription.objects.filter(user=user, account_id=account_id)
+    if not await subscribed.aexists():
+        raise AccountNotFound(account_id)
+    since = since or datetime.now(timezone.utc) - timedelta(days=30)
+    data = await sync_to_async(account_series)(account_id, interval, since, until)
+    return ResponseMulti[MetricPointSchema](data=data)
+
+
+@router.get(path="/posts/{id}/metrics", status_code=status.HTTP_200_OK, tags=["Posts"])
+async def get_post_metrics(
+        post_id: PostID,
+        interval: Interval = Query("day", title="Bucket size"),
+        since: Since = None,
+        until: Until = None,
+        user: User = Depends(user_auth.get_current_user)
+) -> ResponseMulti[MetricPointSchema]:
+    """Likes and comments of the post at the end of each bucket it changed in"""
+    visible = Post.objects.filter(id=post_id, account__subscriptions__user=user.id)
+    if not await visible.aexists():
+        raise PostNotFound(post_id)
+    since = since or datetime.now(timezone.utc) - timedelta(days=30)
+    data = await sync_to_async(post_series)(post_id, interval, since, until)
+    return ResponseMulti[MetricPointSchema](data=data)
 
 
 @router.post(path="/accounts/{id}/tags", status_code=status.HTTP_201_CREATED, tags=["Tags"])
@@ -141,4 +274,4 @@ async def get_tags(
     queryset = Tag.objects.all()
     if q:
         queryset = queryset.filter(title__icontains=q)
-    return await paginate(queryset, params, TagSchemaResponse)
+    return await paginate(queryset, params, TagSchemaResponse, count="estimate")
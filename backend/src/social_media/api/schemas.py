@@ -47,3 +47,9 @@ class PostSchemaResponse(PublicSchema):
     created_at: datetime
     store_at: datetime
     tags: TagsForPostSchemaResponse
+
+
+class MetricPointSchema(PublicSchema):
+    bucket: datetime
+    likes: int
+    comments: int
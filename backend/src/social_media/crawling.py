@@ -0,0 +1,370 @@
+"""
+Adaptive crawl scheduling.
+Every crawl result updates an estimate of how often the account posts and the
+time its next crawl is due, so active accounts are crawled often and dormant
+ones rarely. `claim_due_accounts` hands out only the due accounts, most
+overdue first, page by page within the request budget of a provider, in the
+low lane. New accounts get their first crawl at once in the high lane.
+
+Backfills walk the whole history of an account in the lowest lane. Every page
+is stored with the cursor of the next one in the same transaction, so an
+interrupted backfill resumes from its last stored page.
+
+Every handed out crawl is a `CrawlJob` leased until its result arrives, an
+account with a live job is not handed out again. Under overload the crawler
+queue holds at most one message per account.
+"""
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone as django_timezone
+
+from social_media.ingest import post_uid
+from social_media.models import Account, CrawlJob, UserSubscription
+from social_media.outbox import enqueue
+
+__all__ = (
+    "CrawlKey",
+    "next_interval",
+    "high_water_mark",
+    "observe_crawls",
+    "expire_jobs",
+    "start_job",
+    "fail_job",
+    "Lane",
+    "crawl_queue",
+    "crawl_message",
+    "claim_due_accounts",
+    "crawl_first",
+    "backfill_message",
+    "start_backfill",
+    "observe_backfills",
+    "resume_backfills",
+)
+
+CrawlKey = tuple[datetime, int]
+
+
+def next_interval(post_rate: float) -> timedelta:
+    """Time until `CRAWLER.posts_per_crawl` new posts are expected."""
+    config = settings.CRAWLER
+    if post_rate <= 0:
+        seconds = config.max_interval
+    else:
+        seconds = config.posts_per_crawl / post_rate * 3600
+    seconds = min(max(seconds, config.min_interval), config.max_interval)
+    return timedelta(seconds=seconds)
+
+
+def _timestamp(value: int) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def high_water_mark(account: Account) -> Optional[dict]:
+    """Newest stored post of the account, the crawler stops once it reaches it."""
+    if account.last_post_uid is None or account.last_post_at is None:
+        return None
+    return {
+        "uid": account.last_post_uid,
+        "created_at": int(account.last_post_at.timestamp()),
+    }
+
+
+def _order(post: tuple[datetime, Optional[str]]) -> tuple[datetime, int, str]:
+    """`(created_at, uid)` ordered like the crawlers compare them to the mark,
+    by the numeric media id within a second: shorter ids are smaller."""
+    created_at, uid = post
+    return created_at, len(uid or ""), uid or ""
+
+
+def _observe(account: Account, data: dict, now: datetime) -> None:
+    config = settings.CRAWLER
+    last = account.last_post_at
+    posts = sorted(
+        ((_timestamp(i["created_at"]), post_uid(i)) for i in data["items"]), key=_order
+    )
+    created = [created_at for created_at, _ in posts]
+    if account.last_crawled_at is None:
+        # First crawl, estimate the rate from the span of the fetched posts.
+        span = (created[-1] - created[0]).total_seconds() / 3600 if created else 0
+        account.post_rate = (len(created) - 1) / span if span else 0
+    else:
+        new = [i for i in created if last is None or i > last]
+        elapsed = (now - account.last_crawled_at).total_seconds()
+        elapsed = max(elapsed, config.min_interval)
+        rate = len(new) / (elapsed / 3600)
+        alpha = config.rate_smoothing
+        account.post_rate = alpha * rate + (1 - alpha) * account.post_rate
+    interval = next_interval(account.post_rate)
+    if (
+        last is not None
+        and len(created) >= config.page_size * config.max_pages
+        and created[0] > last
+    ):
+        # The whole window is new, posts may have been missed: come back soon.
+        interval = timedelta(seconds=config.min_interval)
+    account.last_crawled_at = now
+    account.next_crawl_at = now + interval
+    # Pinned posts may be older than the mark, it only moves on.
+    if posts and (
+        last is None or _order(posts[-1]) > _order((last, account.last_post_uid))
+    ):
+        account.last_post_at, account.last_post_uid = posts[-1]
+
+
+def observe_crawls(batch: list[dict]) -> None:
+    """Reschedule the accounts of the crawl results in `batch`,
+    the caller owns the transaction."""
+    now = django_timezone.now()
+    accounts = Account.objects.in_bulk({int(data["account_id"]) for data in batch})
+    for data in batch:
+        if (account := accounts.get(int(data["account_id"]))) is not None:
+            _observe(account, data, now)
+    CrawlJob.objects.filter(
+        id__in=[data["job_id"] for data in batch if data.get("job_id")]
+    ).exclude(status=CrawlJob.Status.DONE).update(
+        status=CrawlJob.Status.DONE, finished_at=now
+    )
+    Account.objects.bulk_update(
+        accounts.values(),
+        [
+            "post_rate",
+            "last_crawled_at",
+            "last_post_at",
+            "last_post_uid",
+            "next_crawl_at",
+        ],
+    )
+
+
+def expire_jobs() -> int:
+    """Expire live jobs past their lease and forget old finished ones."""
+    now = django_timezone.now()
+    expired = CrawlJob.objects.filter(
+        status__in=CrawlJob.LIVE, lease_until__lt=now
+    ).update(status=CrawlJob.Status.EXPIRED, finished_at=now)
+    retention = timedelta(seconds=settings.CRAWLER.job_retention)
+    CrawlJob.objects.filter(finished_at__lt=now - retention).delete()
+    return expired
+
+
+def start_job(job_id: int) -> None:
+    """A crawler picked the job up, it now has `running_lease` to finish."""
+    now = django_timezone.now()
+    CrawlJob.objects.filter(id=job_id, status=CrawlJob.Status.QUEUED).update(
+        status=CrawlJob.Status.RUNNING,
+        started_at=now,
+        lease_until=now + timedelta(seconds=settings.CRAWLER.running_lease),
+    )
+
+
+def fail_job(job_id: int) -> None:
+    """A crawler reported an error, the account of a failed crawl is due again
+    after `retry_delay` instead of the end of the lease of its claim."""
+    now = django_timezone.now()
+    job = CrawlJob.objects.filter(id=job_id, status__in=CrawlJob.LIVE).first()
+    if job is None:
+        return
+    failed = CrawlJob.objects.filter(id=job.id, status__in=CrawlJob.LIVE).update(
+        status=CrawlJob.Status.FAILED, finished_at=now
+    )
+    if failed and job.kind == CrawlJob.Kind.CRAWL:
+        Account.objects.filter(id=job.account_id).update(
+            next_crawl_at=now + timedelta(seconds=settings.CRAWLER.retry_delay)
+        )
+
+
+class Lane(str, Enum):
+    """Crawler input lanes, the crawlers serve `HIGH` first and `BACKFILL`
+    only with the capacity left by the others."""
+
+    HIGH = "high"
+    LOW = "low"
+    BACKFILL = "backfill"
+
+
+def crawl_queue(provider: str, lane: Lane) -> str:
+    queue = f"crawler:input:{provider.lower()}"
+    return queue if lane == Lane.LOW else f"{queue}:{lane.value}"
+
+
+def crawl_message(account: Account, job: CrawlJob) -> dict:
+    config = settings.CRAWLER
+    return {
+        "callback": "start",
+        "metadata": {
+            "page_size": config.page_size,
+            "max_pages": config.max_pages,
+            "username": account.username,
+            "account_id": account.id,
+            "since": high_water_mark(account),
+            "job_id": job.id,
+        },
+    }
+
+
+def claim_due_accounts(
+    provider: str, limit: int, after: Optional[CrawlKey] = None
+) -> list[CrawlKey]:
+    """Queue crawls of up to `limit` due accounts of `provider` in the outbox,
+    the caller owns the transaction. Accounts are walked in `(next_crawl_at, id)`
+    order starting after the key `after`, the keys of the queued accounts
+    are returned to continue from the last one."""
+    config = settings.CRAWLER
+    now = django_timezone.now()
+    live = CrawlJob.objects.filter(
+        account=OuterRef("pk"), kind=CrawlJob.Kind.CRAWL, status__in=CrawlJob.LIVE
+    )
+    queryset = Account.objects.filter(
+        Exists(UserSubscription.objects.filter(account=OuterRef("pk"))),
+        ~Exists(live),
+        provider=provider,
+        next_crawl_at__lte=now,
+    )
+    if after is not None:
+        queryset = queryset.filter(
+            Q(next_crawl_at__gt=after[0]) | Q(next_crawl_at=after[0], id__gt=after[1])
+        )
+    queryset = queryset.order_by("next_crawl_at", "id").only(
+        "id", "username", "next_crawl_at", "last_post_at", "last_post_uid"
+    )
+    accounts = list(queryset.select_for_update(skip_locked=True)[:limit])
+    if not accounts:
+        return []
+    lease_until = now + timedelta(seconds=config.job_lease)
+    # Rescheduled for real once the result arrives, see `observe_crawls`.
+    Account.objects.filter(id__in=[i.id for i in accounts]).update(
+        next_crawl_at=lease_until
+    )
+    jobs = CrawlJob.objects.bulk_create(
+        [CrawlJob(account=account, lease_until=lease_until) for account in accounts]
+    )
+    enqueue(
+        [
+            (crawl_queue(provider, Lane.LOW), crawl_message(account, job))
+            for account, job in zip(accounts, jobs)
+        ]
+    )
+    return [(account.next_crawl_at, account.id) for account in accounts]
+
+
+def crawl_first(account: Account) -> bool:
+    """Queue the first crawl of a new account in the high lane,
+    the caller owns the transaction. Returns whether a crawl was queued."""
+    if account.last_crawled_at is not None:
+        return False
+    now = django_timezone.now()
+    lease_until = now + timedelta(seconds=settings.CRAWLER.job_lease)
+    # A routine crawl still waiting in the low lane is overtaken.
+    CrawlJob.objects.filter(
+        account=account, kind=CrawlJob.Kind.CRAWL, status=CrawlJob.Status.QUEUED
+    ).update(status=CrawlJob.Status.EXPIRED, finished_at=now)
+    try:
+        with transaction.atomic():
+            job = CrawlJob.objects.create(account=account, lease_until=lease_until)
+    except IntegrityError:
+        # Already running.
+        return False
+    Account.objects.filter(id=account.id).update(next_crawl_at=lease_until)
+    enqueue([(crawl_queue(account.provider, Lane.HIGH), crawl_message(account, job))])
+    return True
+
+
+def backfill_message(account: Account, job: CrawlJob) -> dict:
+    config = settings.CRAWLER
+    return {
+        "callback": "start",
+        "metadata": {
+            "page_size": config.page_size,
+            "max_pages": config.backfill_pages,
+            "username": account.username,
+            "account_id": account.id,
+            "job_id": job.id,
+            "backfill": True,
+            "after": account.backfill_cursor,
+        },
+    }
+
+
+def _queue_backfill(account: Account, now: datetime) -> bool:
+    lease_until = now + timedelta(seconds=settings.CRAWLER.job_lease)
+    try:
+        with transaction.atomic():
+            job = CrawlJob.objects.create(
+                account=account, kind=CrawlJob.Kind.BACKFILL, lease_until=lease_until
+            )
+    except IntegrityError:
+        # Already running.
+        return False
+    enqueue(
+        [(crawl_queue(account.provider, Lane.BACKFILL), backfill_message(account, job))]
+    )
+    return True
+
+
+def start_backfill(account: Account, restart: bool = False) -> bool:
+    """Queue a crawl of the whole history of `account` in the backfill lane,
+    resuming from its checkpoint unless `restart`. The caller owns the
+    transaction. Returns whether a job was queued."""
+    now = django_timezone.now()
+    if restart or account.backfill_started_at is None:
+        CrawlJob.objects.filter(
+            account=account, kind=CrawlJob.Kind.BACKFILL, status__in=CrawlJob.LIVE
+        ).update(status=CrawlJob.Status.EXPIRED, finished_at=now)
+        account.backfill_cursor = None
+        account.backfill_started_at = now
+        account.backfill_finished_at = None
+        account.save(
+            update_fields=[
+                "backfill_cursor",
+                "backfill_started_at",
+                "backfill_finished_at",
+            ]
+        )
+    elif account.backfill_finished_at is not None:
+        return False
+    return _queue_backfill(account, now)
+
+
+def observe_backfills(batch: list[dict]) -> None:
+    """Checkpoint the backfill pages in `batch` and queue the next job of the
+    accounts whose job ended, the caller owns the transaction.
+    Pages are sent one by one, a job ends with its `last` page."""
+    now = django_timezone.now()
+    lease_until = now + timedelta(seconds=settings.CRAWLER.running_lease)
+    for data in batch:
+        account_id = int(data["account_id"])
+        cursor = data.get("end_cursor")
+        job = CrawlJob.objects.filter(
+            id=data.get("job_id"), kind=CrawlJob.Kind.BACKFILL, status__in=CrawlJob.LIVE
+        )
+        if not job.exists():
+            # A late page of an expired or restarted job, its posts are kept.
+            continue
+        Account.objects.filter(id=account_id).update(
+            backfill_cursor=cursor, backfill_finished_at=None if cursor else now
+        )
+        if not data.get("last"):
+            job.update(lease_until=lease_until)
+            continue
+        job.update(status=CrawlJob.Status.DONE, finished_at=now)
+        if cursor and (account := Account.objects.filter(id=account_id).first()):
+            _queue_backfill(account, now)
+
+
+def resume_backfills(limit: int) -> int:
+    """Requeue backfills whose job was lost, e.g. to a crawler restart."""
+    live = CrawlJob.objects.filter(
+        account=OuterRef("pk"), kind=CrawlJob.Kind.BACKFILL, status__in=CrawlJob.LIVE
+    )
+    accounts = Account.objects.filter(
+        ~Exists(live),
+        backfill_started_at__isnull=False,
+        backfill_finished_at__isnull=True,
+    ).order_by("backfill_started_at", "id")
+    now = django_timezone.now()
+    return sum(_queue_backfill(account, now) for account in accounts[:limit])
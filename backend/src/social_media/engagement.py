@@ -0,0 +1,227 @@
+"""
+Engagement history of posts kept in `social_media_post_metrics`.
+The table is range partitioned by month on `observed_at`: the ingest path only
+appends to the current month, series reads touch the months they cover and
+old months are removed by detaching their partition instead of deleting rows.
+"""
+import re
+from datetime import date, datetime, timezone
+from typing import Literal, Optional
+
+from django.conf import settings
+from django.db import connection
+from loguru import logger
+
+from core.db.utils import atomic_in_thread
+from social_media.models import Post, PostMetric
+
+__all__ = (
+    "Interval",
+    "partitions",
+    "ensure_partitions",
+    "drop_partitions",
+    "maintain_partitions",
+    "post_series",
+    "account_series",
+)
+
+Interval = Literal["hour", "day", "week", "month"]
+
+TABLE = PostMetric._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+PARTITIONS_SQL = """
+    SELECT child.relname FROM pg_inherits
+    JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = %s
+"""
+
+# Rows of the month that already reached the default partition are moved
+# before the attach, otherwise the attach fails on them.
+CREATE_PARTITION_SQL = (
+    "CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+    """
+    WITH moved AS (
+        DELETE FROM {default} WHERE observed_at >= %(start)s AND observed_at < %(end)s
+        RETURNING *
+    )
+    INSERT INTO {partition} SELECT * FROM moved
+    """,
+    """
+    ALTER TABLE {table} ATTACH PARTITION {partition}
+    FOR VALUES FROM (%(start)s) TO (%(end)s)
+    """,
+)
+
+# Totals at the end of every bucket holding a change of the post.
+POST_SERIES_SQL = """
+    SELECT DISTINCT ON (bucket)
+        date_trunc(%(interval)s, observed_at) AS bucket, likes, comments
+    FROM {table}
+    WHERE post_id = %(post_id)s
+      AND observed_at >= %(since)s AND observed_at < %(until)s
+    ORDER BY bucket, observed_at DESC
+"""
+
+# Snapshots are only written when a post changes, so the totals of an account
+# are the running sum of the per post differences between snapshots. Each post
+# starts from its last snapshot before the first bucket, found by one probe of
+# the `(post_id, observed_at)` index, and only the snapshots of the covered
+# months are read after it. The starting totals fall in the first bucket.
+ACCOUNT_SERIES_SQL = """
+    WITH snapshots AS (
+        SELECT last.* FROM {post} AS p
+        CROSS JOIN LATERAL (
+            SELECT m.post_id, m.observed_at, m.likes, m.comments FROM {table} AS m
+            WHERE m.post_id = p.id AND m.observed_at < {start}
+            ORDER BY m.observed_at DESC
+            LIMIT 1
+        ) AS last
+        WHERE p.account_id = %(account_id)s
+        UNION ALL
+        SELECT m.post_id, m.observed_at, m.likes, m.comments
+        FROM {table} AS m
+        JOIN {post} AS p ON p.id = m.post_id
+        WHERE p.account_id = %(account_id)s
+          AND m.observed_at >= {start} AND m.observed_at < %(until)s
+    ), changes AS (
+        SELECT
+            greatest(date_trunc(%(interval)s, observed_at), {start}) AS bucket,
+            likes - coalesce(lag(likes) OVER w, 0) AS likes,
+            comments - coalesce(lag(comments) OVER w, 0) AS comments
+        FROM snapshots
+        WINDOW w AS (PARTITION BY post_id ORDER BY observed_at)
+    )
+    SELECT
+        bucket,
+        sum(sum(likes)) OVER (ORDER BY bucket)::bigint AS likes,
+        sum(sum(comments)) OVER (ORDER BY bucket)::bigint AS comments
+    FROM changes
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def partitions() -> dict[date, str]:
+    """Attached monthly partitions keyed by the first day of their month."""
+    with connection.cursor() as cursor:
+        cursor.execute(PARTITIONS_SQL, [TABLE])
+        names = [name for name, in cursor.fetchall()]
+    return {
+        date(int(match[1]), int(match[2]), 1): name
+        for name in names
+        if (match := PARTITION_RE.match(name))
+    }
+
+
+def ensure_partitions(ahead: int) -> list[str]:
+    """Create the partitions of the current and the next `ahead` months."""
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    existing = partitions()
+    created = []
+    with connection.cursor() as cursor:
+        for month in (_add_months(current, i) for i in range(ahead + 1)):
+            if month in existing:
+                continue
+            sql = {
+                "table": TABLE,
+                "default": DEFAULT_PARTITION,
+                "partition": _partition_name(month),
+            }
+            bounds = {"start": month, "end": _add_months(month, 1)}
+            for statement in CREATE_PARTITION_SQL:
+                cursor.execute(statement.format(**sql), bounds)
+            created.append(sql["partition"])
+    return created
+
+
+def drop_partitions(before: date) -> list[str]:
+    """Detach and drop the partitions of the months ending before `before`."""
+    dropped = []
+    with connection.cursor() as cursor:
+        for month, name in sorted(partitions().items()):
+            if _add_months(month, 1) > before:
+                break
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+    return dropped
+
+
+def _maintain() -> None:
+    created = ensure_partitions(settings.METRICS.partitions_ahead)
+    dropped = []
+    if settings.METRICS.retention_months is not None:
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        dropped = drop_partitions(
+            _add_months(current, -settings.METRICS.retention_months)
+        )
+    if created or dropped:
+        logger.info(f"Post metrics partitions created {created}, dropped {dropped}")
+
+
+async def maintain_partitions() -> None:
+    """Daily job keeping partitions ahead of time and applying the retention."""
+    await atomic_in_thread(_maintain)
+
+
+# Start of the first bucket, a stable expression the partitions are pruned by.
+START_SQL = "date_trunc(%(interval)s, %(since)s::timestamptz)"
+
+
+def _fetch(sql: str, params: dict) -> list[dict]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.format(table=TABLE, post=Post._meta.db_table, start=START_SQL), params
+        )
+        return [
+            {"bucket": bucket, "likes": likes, "comments": comments}
+            for bucket, likes, comments in cursor.fetchall()
+        ]
+
+
+def post_series(
+    post_id: int,
+    interval: Interval,
+    since: datetime,
+    until: Optional[datetime] = None,
+) -> list[dict]:
+    """Likes and comments of a post at the end of each `interval`."""
+    return _fetch(
+        POST_SERIES_SQL,
+        {
+            "post_id": post_id,
+            "interval": interval,
+            "since": since,
+            "until": until or datetime.now(timezone.utc),
+        },
+    )
+
+
+def account_series(
+    account_id: int,
+    interval: Interval,
+    since: datetime,
+    until: Optional[datetime] = None,
+) -> list[dict]:
+    """Likes and comments of all posts of an account at the end of each `interval`."""
+    return _fetch(
+        ACCOUNT_SERIES_SQL,
+        {
+            "account_id": account_id,
+            "interval": interval,
+            "since": since,
+            "until": until or datetime.now(timezone.utc),
+        },
+    )
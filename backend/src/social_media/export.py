@@ -0,0 +1,90 @@
+"""
+Streaming exports of posts.
+Rows are read through a server-side cursor chunk by chunk and every chunk is
+written out before the next one is fetched, so memory use does not depend on
+the size of the export.
+"""
+import csv
+import io
+from typing import AsyncIterator, Literal
+
+from django.db.models import QuerySet
+from pydantic import TypeAdapter
+
+from social_media.api.schemas import PostSchemaResponse
+
+__all__ = ("ExportFormat", "MEDIA_TYPES", "export_posts")
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CHUNK_SIZE = 2000
+
+CSV_FIELDS = (
+    "id",
+    "uid",
+    "username",
+    "created_at",
+    "store_at",
+    "likes",
+    "comments",
+    "description",
+    "tags",
+)
+
+posts_adapter = TypeAdapter(list[PostSchemaResponse])
+
+
+async def _chunks(queryset: QuerySet) -> AsyncIterator[list[PostSchemaResponse]]:
+    chunk = []
+    async for row in queryset.aiterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield posts_adapter.validate_python(chunk, from_attributes=True)
+            chunk = []
+    if chunk:
+        yield posts_adapter.validate_python(chunk, from_attributes=True)
+
+
+async def _ndjson(queryset: QuerySet) -> AsyncIterator[bytes]:
+    async for posts in _chunks(queryset):
+        yield b"".join(post.model_dump_json().encode() + b"\n" for post in posts)
+
+
+async def _csv(queryset: QuerySet) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    async for posts in _chunks(queryset):
+        for post in posts:
+            writer.writerow(
+                (
+                    post.id,
+                    post.uid,
+                    post.username,
+                    post.created_at.isoformat(),
+                    post.store_at.isoformat(),
+                    post.likes,
+                    post.comments,
+                    post.description,
+                    ",".join(tag.title for tag in post.tags.items),
+                )
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # The header of an empty export.
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_posts(
+    queryset: QuerySet, format: ExportFormat
+) -> AsyncIterator[bytes] | AsyncIterator[str]:
+    """Rows of `Post.extract` as NDJSON lines or CSV records, newest first."""
+    queryset = queryset.order_by("-created_at", "-id")
+    return _csv(queryset) if format == "csv" else _ndjson(queryset)
@@ -0,0 +1,316 @@
+"""
+Timeline of the posts of every account a user is subscribed to, newest first.
+Pages are merged from the `(account, -created_at, -id)` index of each account:
+a LATERAL subquery reads at most one page past the cursor from every account
+and only those candidates are sorted, so a page costs one short index scan
+per subscription however long the histories are.
+With `FEED.fan_out` posts are instead copied to the `FeedEntry` rows of the
+subscribers when they are stored, and a page is a single range of the feed
+index of the user. Writes grow with the subscribers of an account, each feed
+keeps the newest `FEED.max_entries` posts, run `rebuild_feeds` after turning
+it on.
+"""
+from datetime import datetime
+from typing import Collection, Optional
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef, QuerySet
+
+from core.errors.exceptions import InvalidCursor
+from core.pagination import CursorParamsInput, PaginationResponse, cursor_response
+from core.pagination.query import count_rows, decode_cursor, encode_cursor
+from social_media.api.schemas import PostSchemaResponse
+from social_media.models import FeedEntry, Post, UserSubscription
+from users.models import User
+
+__all__ = (
+    "feed_posts",
+    "feed_page",
+    "fan_out",
+    "fill_feeds",
+    "drop_feed_entries",
+)
+
+FeedKey = tuple[datetime, int]
+
+FEED_SQL = """
+    SELECT p.created_at, p.id
+    FROM {subscription} AS s
+    CROSS JOIN LATERAL (
+        SELECT p.created_at, p.id FROM {post} AS p
+        WHERE p.account_id = s.account_id {after} {tagged}
+        ORDER BY p.created_at {order}, p.id {order}
+        LIMIT %(candidates)s
+    ) AS p
+    WHERE s.user_id = %(user_id)s {following}
+    ORDER BY p.created_at {order}, p.id {order}
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+ENTRIES_SQL = """
+    SELECT e.created_at, e.post_id FROM {entry} AS e
+    WHERE e.user_id = %(user_id)s {after} {tagged}
+    ORDER BY e.created_at {order}, e.post_id {order}
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+# A row comparison, the index scans start at the cursor.
+AFTER_SQL = "AND ({columns}) {op} (%(created_at)s::timestamptz, %(id)s)"
+
+TAGGED_SQL = """
+    AND EXISTS (
+        SELECT 1 FROM {post_tags} AS pt
+        JOIN {follow_tags} AS ft ON ft.tag_id = pt.tag_id
+        WHERE pt.post_id = p.id AND ft.usersubscription_id = s.id
+    )
+"""
+
+# Accounts without followed tags are not scanned for tagged posts at all.
+FOLLOWING_SQL = """
+    AND EXISTS (
+        SELECT 1 FROM {follow_tags} AS ft WHERE ft.usersubscription_id = s.id
+    )
+"""
+
+# Entries of the posts `p` for the subscriptions `s`, a user subscribed twice
+# to an account gets one. Only rows whose post changed are rewritten.
+UPSERT_ENTRIES_SQL = """
+    INSERT INTO {entry} AS e (user_id, post_id, created_at, matched_tags)
+    SELECT DISTINCT ON (s.user_id, p.id)
+        s.user_id, p.id, p.created_at, array(
+            SELECT ft.tag_id FROM {follow_tags} AS ft
+            JOIN {post_tags} AS pt ON pt.tag_id = ft.tag_id
+            WHERE ft.usersubscription_id = s.id AND pt.post_id = p.id
+            ORDER BY ft.tag_id
+        )
+    {source}
+    ON CONFLICT (user_id, post_id) DO UPDATE SET
+        created_at = EXCLUDED.created_at,
+        matched_tags = EXCLUDED.matched_tags
+    WHERE (e.created_at, e.matched_tags)
+        IS DISTINCT FROM (EXCLUDED.created_at, EXCLUDED.matched_tags)
+    RETURNING user_id
+"""
+
+POSTS_SOURCE_SQL = """
+    FROM {post} AS p
+    JOIN {subscription} AS s ON s.account_id = p.account_id
+    WHERE p.id = ANY(%(post_ids)s::bigint[])
+"""
+
+# Only the newest `keep` posts of all the subscriptions of a user can stay in
+# its feed, no account has more.
+SUBSCRIPTIONS_SOURCE_SQL = """
+    FROM (
+        SELECT s.id AS subscription_id, p.id AS post_id, row_number() OVER (
+            PARTITION BY s.user_id ORDER BY p.created_at DESC, p.id DESC
+        ) AS n
+        FROM {subscription} AS s
+        CROSS JOIN LATERAL (
+            SELECT p.id, p.created_at FROM {post} AS p
+            WHERE p.account_id = s.account_id
+            ORDER BY p.created_at DESC, p.id DESC
+            LIMIT %(keep)s
+        ) AS p
+        WHERE s.id = ANY(%(subscription_ids)s::uuid[])
+    ) AS newest
+    JOIN {subscription} AS s ON s.id = newest.subscription_id
+    JOIN {post} AS p ON p.id = newest.post_id
+    WHERE newest.n <= %(keep)s
+"""
+
+# Entries of every user past its newest `keep`.
+TRIM_SQL = """
+    DELETE FROM {entry} AS e
+    USING unnest(%(user_ids)s::uuid[]) AS u (user_id)
+    CROSS JOIN LATERAL (
+        SELECT created_at, post_id FROM {entry}
+        WHERE user_id = u.user_id
+        ORDER BY created_at DESC, post_id DESC
+        OFFSET %(keep)s LIMIT 1
+    ) AS edge
+    WHERE e.user_id = u.user_id
+      AND (e.created_at, e.post_id) <= (edge.created_at, edge.post_id)
+"""
+
+
+def _tables() -> dict[str, str]:
+    return {
+        "entry": FeedEntry._meta.db_table,
+        "post": Post._meta.db_table,
+        "subscription": UserSubscription._meta.db_table,
+        "post_tags": Post.tags.through._meta.db_table,
+        "follow_tags": UserSubscription.follow_tags.through._meta.db_table,
+    }
+
+
+def feed_posts(user: User, tagged: bool = False) -> QuerySet:
+    """All posts of the feed of `user`, only carrying a tag it follows on the
+    account if `tagged`. Used for the total of merged feeds, pages are read by
+    `feed_page`."""
+    queryset = Post.extract(user=user)
+    if tagged:
+        followed = UserSubscription.follow_tags.through.objects.filter(
+            usersubscription__user=user.id,
+            usersubscription__account=OuterRef("account_id"),
+            tag__posts=OuterRef("id"),
+        )
+        queryset = queryset.filter(Exists(followed))
+    return queryset
+
+
+def _decode(cursor: str) -> tuple[FeedKey, bool]:
+    (created_at, pk), backward = decode_cursor(cursor, 2)
+    try:
+        return (datetime.fromisoformat(created_at), int(pk)), backward
+    except (TypeError, ValueError):
+        raise InvalidCursor()
+
+
+def _merged_sql(after: bool, backward: bool, tagged: bool) -> str:
+    tables = _tables()
+    return FEED_SQL.format(
+        **tables,
+        order="ASC" if backward else "DESC",
+        after=AFTER_SQL.format(
+            columns="p.created_at, p.id", op=">" if backward else "<"
+        )
+        if after
+        else "",
+        tagged=TAGGED_SQL.format(**tables) if tagged else "",
+        following=FOLLOWING_SQL.format(**tables) if tagged else "",
+    )
+
+
+def _entries_sql(after: bool, backward: bool, tagged: bool) -> str:
+    return ENTRIES_SQL.format(
+        **_tables(),
+        order="ASC" if backward else "DESC",
+        after=AFTER_SQL.format(
+            columns="e.created_at, e.post_id", op=">" if backward else "<"
+        )
+        if after
+        else "",
+        # The condition of the partial index of tagged entries.
+        tagged="AND NOT e.matched_tags = '{}'::bigint[]" if tagged else "",
+    )
+
+
+def _page_keys(
+    user_id: UUID,
+    after: Optional[FeedKey],
+    backward: bool,
+    tagged: bool,
+    offset: int,
+    limit: int,
+) -> list[FeedKey]:
+    """`(created_at, id)` of `limit` feed posts after `offset` of them."""
+    build = _entries_sql if settings.FEED.fan_out else _merged_sql
+    params = {
+        "user_id": user_id,
+        # No account can put more posts before the last one of the page.
+        "candidates": offset + limit,
+        "limit": limit,
+        "offset": offset,
+    }
+    if after:
+        params["created_at"], params["id"] = after
+    with connection.cursor() as cursor:
+        cursor.execute(build(bool(after), backward, tagged), params)
+        return cursor.fetchall()
+
+
+def _counted(user: User, tagged: bool) -> QuerySet:
+    if not settings.FEED.fan_out:
+        return feed_posts(user, tagged)
+    entries = FeedEntry.objects.filter(user=user.id)
+    return entries.exclude(matched_tags=[]) if tagged else entries
+
+
+async def feed_page(
+    user: User, params: CursorParamsInput, tagged: bool = False
+) -> PaginationResponse:
+    """Page of the feed of `user`, see `feed_posts` for `tagged`.
+    The first page may be positioned by `page` and `skip`, the next ones are
+    read through the cursors like the keyset pages of `paginate`."""
+    limit = params.limit
+    after, backward, offset = None, False, 0
+    if params.cursor:
+        after, backward = _decode(params.cursor)
+    else:
+        offset = (params.page - 1) * limit + (params.skip or 0)
+    # One extra row tells whether there is a page after this one.
+    keys = await sync_to_async(_page_keys)(
+        user.id, after, backward, tagged, offset, limit + 1
+    )
+    more = len(keys) > limit
+    keys = keys[:limit]
+    if backward:
+        keys.reverse()
+    if after:
+        has_next, has_previous = (True, more) if backward else (more, True)
+    else:
+        has_next, has_previous = more, offset > 0
+
+    # The page rows are built by the same query as the posts of an account.
+    rows = [
+        row
+        async for row in Post.extract(user=user).filter(id__in=[pk for _, pk in keys])
+    ]
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(keys[-1])
+    if rows and has_previous:
+        previous_cursor = encode_cursor(keys[0], backward=True)
+
+    total, estimated = None, False
+    if params.with_total:
+        total, estimated = await count_rows(_counted(user, tagged), "estimate")
+    return cursor_response(
+        rows,
+        params,
+        PostSchemaResponse,
+        next_cursor,
+        previous_cursor,
+        total=total,
+        estimated=estimated,
+    )
+
+
+def _upsert_entries(source: str, params: dict) -> None:
+    tables = _tables()
+    keep = settings.FEED.max_entries
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_ENTRIES_SQL.format(**tables, source=source.format(**tables)),
+            {**params, "keep": keep},
+        )
+        user_ids = list({user_id for user_id, in cursor.fetchall()})
+        if user_ids:
+            cursor.execute(
+                TRIM_SQL.format(**tables), {"user_ids": user_ids, "keep": keep}
+            )
+
+
+def fan_out(post_ids: Collection[int]) -> None:
+    """Copy the written posts to the feeds of the subscribers of their
+    accounts, the caller owns the transaction. Their tags must be linked."""
+    if post_ids:
+        _upsert_entries(POSTS_SOURCE_SQL, {"post_ids": list(post_ids)})
+
+
+def fill_feeds(subscription_ids: Collection[UUID]) -> None:
+    """Write the newest posts of the subscribed accounts to the feeds of the
+    subscribers, with the tags they follow now."""
+    if subscription_ids:
+        _upsert_entries(
+            SUBSCRIPTIONS_SOURCE_SQL, {"subscription_ids": list(subscription_ids)}
+        )
+
+
+def drop_feed_entries(user_id: UUID, account_id: int) -> None:
+    """Remove the posts of an account from the feed of a user unsubscribed."""
+    FeedEntry.objects.filter(user_id=user_id, post__account_id=account_id).delete()
@@ -0,0 +1,95 @@
+"""
+In-memory inverted index of followed tags used on the ingest path.
+Subscription changes in this process invalidate it right after commit,
+changes made by other processes are picked up after `ttl` seconds.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from social_media.models import UserSubscription
+
+__all__ = ("FollowEntry", "FollowedTagIndex", "follow_index")
+
+
+class FollowEntry(NamedTuple):
+    account_id: int
+    subscription_id: UUID
+    user_id: UUID
+
+
+class FollowedTagIndex:
+    """(account_id, tag_id) -> subscriptions to the account following the tag."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: dict[tuple[int, int], set[FollowEntry]] = {}
+        self._built_at: Optional[float] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._built_at = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.ttl
+
+    @staticmethod
+    def _load() -> dict[tuple[int, int], set[FollowEntry]]:
+        entries: dict[tuple[int, int], set[FollowEntry]] = defaultdict(set)
+        rows = UserSubscription.follow_tags.through.objects.values_list(
+            "tag_id",
+            "usersubscription__account_id",
+            "usersubscription_id",
+            "usersubscription__user_id",
+        )
+        for tag_id, *entry in rows.iterator(chunk_size=5000):
+            follow = FollowEntry(*entry)
+            entries[(follow.account_id, tag_id)].add(follow)
+        return dict(entries)
+
+    async def refresh(self) -> None:
+        """Rebuild the index if it is stale, the query runs off the event loop.
+        Concurrent callers wait for a single rebuild."""
+        if not self.is_stale:
+            return
+        async with self._lock:
+            # Rebuilt by the caller holding the lock before.
+            if not self.is_stale:
+                return
+            generation = self._generation
+            entries = await sync_to_async(self._load)()
+            self._entries = entries
+            # Keep it stale if it was invalidated while loading.
+            if generation == self._generation:
+                self._built_at = time.monotonic()
+
+    def match(
+        self, account_id: int, tag_ids: Iterable[int]
+    ) -> dict[FollowEntry, set[int]]:
+        """Subscriptions to `account_id` following any of `tag_ids`,
+        with the tags each of them matched."""
+        matches: dict[FollowEntry, set[int]] = defaultdict(set)
+        for tag_id in tag_ids:
+            for entry in self._entries.get((account_id, tag_id), ()):
+                matches[entry].add(tag_id)
+        return dict(matches)
+
+    def recipients(
+        self, account_id: int, tag_ids: Iterable[int]
+    ) -> dict[UUID, set[int]]:
+        """Same as `match`, grouped by the subscribed user."""
+        users: dict[UUID, set[int]] = defaultdict(set)
+        for entry, matched in self.match(account_id, tag_ids).items():
+            users[entry.user_id].update(matched)
+        return dict(users)
+
+
+follow_index = FollowedTagIndex(ttl=settings.INGEST.follow_index_ttl)
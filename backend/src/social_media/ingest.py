@@ -0,0 +1,243 @@
+"""
+Set-based write path for posts delivered by the crawlers.
+Every statement here handles the whole batch at once instead of a row.
+The functions are synchronous and expect the caller to own the transaction,
+see `core.db.utils.atomic_in_thread`.
+"""
+import hashlib
+import json
+from collections import Counter
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from core.cache import TTLCache
+from social_media.models import Account, Post, PostMetric, Tag
+
+__all__ = (
+    "PostKey",
+    "post_uid",
+    "post_fingerprint",
+    "upsert_posts",
+    "resolve_tags",
+    "aresolve_tags",
+    "link_tags",
+    "record_metrics",
+    "bump_versions",
+    "tag_cache",
+    "metrics",
+)
+
+PostKey = tuple[int, str]
+
+UPSERT_POSTS_SQL = """
+    INSERT INTO {table} (
+        account_id, uid, likes, comments, description, created_at, store_at,
+        fingerprint
+    )
+    SELECT * FROM unnest(
+        %s::bigint[], %s::varchar[], %s::integer[], %s::integer[],
+        %s::text[], %s::timestamptz[], %s::timestamptz[], %s::varchar[]
+    )
+    ON CONFLICT (account_id, uid) DO UPDATE SET
+        likes = EXCLUDED.likes,
+        comments = EXCLUDED.comments,
+        description = EXCLUDED.description,
+        created_at = EXCLUDED.created_at,
+        store_at = EXCLUDED.store_at,
+        fingerprint = EXCLUDED.fingerprint
+    WHERE {table}.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint
+    RETURNING id, account_id, uid, xmax = 0
+"""
+
+INSERT_TAGS_SQL = """
+    INSERT INTO {table} (title) SELECT unnest(%s::varchar[])
+    ON CONFLICT (title) DO NOTHING
+    RETURNING id, title
+"""
+
+SELECT_TAGS_SQL = "SELECT id, title FROM {table} WHERE title = ANY(%s::varchar[])"
+
+UNLINK_TAGS_SQL = """
+    DELETE FROM {table} AS t
+    WHERE t.post_id = ANY(%s::bigint[])
+      AND NOT EXISTS (
+        SELECT 1 FROM unnest(%s::bigint[], %s::bigint[]) AS l(post_id, tag_id)
+        WHERE l.post_id = t.post_id AND l.tag_id = t.tag_id
+      )
+"""
+
+LINK_TAGS_SQL = """
+    INSERT INTO {table} (post_id, tag_id)
+    SELECT * FROM unnest(%s::bigint[], %s::bigint[])
+    ON CONFLICT (post_id, tag_id) DO NOTHING
+"""
+
+INSERT_METRICS_SQL = """
+    INSERT INTO {table} (post_id, observed_at, likes, comments)
+    SELECT * FROM unnest(
+        %s::bigint[], %s::timestamptz[], %s::integer[], %s::integer[]
+    )
+"""
+
+
+def post_uid(item: dict) -> str:
+    """Provider ids look like `<media id>_<owner id>`, only the media id is kept."""
+    return item["id"].split("_")[0]
+
+
+def post_fingerprint(item: dict) -> str:
+    """Hash of the fields a refresh can change, equal hashes mean nothing to write."""
+    content = [
+        item.get("like_count") or 0,
+        item.get("comment_count") or 0,
+        item.get("description") or "",
+        sorted(set(item["tags"])),
+    ]
+    return hashlib.blake2b(
+        json.dumps(content, ensure_ascii=False).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _timestamp(value: int) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def upsert_posts(items: list[dict]) -> tuple[dict[PostKey, int], set[PostKey]]:
+    """Insert or update the whole batch with a single statement.
+    Posts whose fingerprint did not change are left untouched.
+    Returns ids of the written posts keyed by `(account_id, uid)` and the keys
+    of the posts inserted by it."""
+    if not items:
+        return {}, set()
+    # ON CONFLICT DO UPDATE can't touch the same row twice in one statement,
+    # so the last copy of a post wins if the batch repeats it.
+    rows = {(int(item["account_id"]), post_uid(item)): item for item in items}
+    columns: list[list] = [[] for _ in range(8)]
+    for (account_id, uid), item in rows.items():
+        values = (
+            account_id,
+            uid,
+            item.get("like_count") or 0,
+            item.get("comment_count") or 0,
+            item.get("description") or "",
+            _timestamp(item["created_at"]),
+            _timestamp(item["stored_at"]),
+            post_fingerprint(item),
+        )
+        for column, value in zip(columns, values):
+            column.append(value)
+
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_POSTS_SQL.format(table=Post._meta.db_table), columns)
+        returned = cursor.fetchall()
+    # `xmax` of a row is only set by the update of a conflict.
+    written = {(account_id, uid): pk for pk, account_id, uid, _ in returned}
+    inserted = {(account_id, uid) for _, account_id, uid, new in returned if new}
+    metrics["posts_written"] += len(written)
+    metrics["posts_skipped"] += len(rows) - len(written)
+    return written, inserted
+
+
+# Process-wide ingest counters.
+metrics: Counter[str] = Counter()
+
+# A title keeps its id until the tag is renamed or deleted in the admin, which
+# clears the cache of that process, see `social_media.signals`. The entries of
+# the other processes expire after `INGEST.tag_cache_ttl`.
+tag_cache: TTLCache[str, int] = TTLCache(
+    maxsize=settings.INGEST.tag_cache_size, ttl=settings.INGEST.tag_cache_ttl
+)
+
+
+def _create_tags(titles: list[str]) -> dict[str, int]:
+    table = Tag._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_TAGS_SQL.format(table=table), [titles])
+        created = {title: pk for pk, title in cursor.fetchall()}
+        existing: dict[str, int] = {}
+        if len(created) < len(titles):
+            cursor.execute(
+                SELECT_TAGS_SQL.format(table=table),
+                [[i for i in titles if i not in created]],
+            )
+            existing = {title: pk for pk, title in cursor.fetchall()}
+    tag_cache.set_many(existing)
+    # New rows disappear if the surrounding transaction rolls back.
+    transaction.on_commit(lambda: tag_cache.set_many(created))
+    return created | existing
+
+
+def resolve_tags(titles: set[str]) -> dict[str, int]:
+    """Map tag titles to ids, creating the missing tags.
+    Only titles missing from `tag_cache` reach the database."""
+    tags = tag_cache.get_many(titles)
+    unknown = sorted(titles - tags.keys())
+    if unknown:
+        tags |= _create_tags(unknown)
+    return tags
+
+
+async def aresolve_tags(titles: set[str]) -> dict[str, int]:
+    """`resolve_tags` run off the event loop when some titles are not cached."""
+    tags = tag_cache.get_many(titles)
+    if len(tags) == len(titles):
+        return tags
+    return await sync_to_async(resolve_tags)(titles)
+
+
+def link_tags(links: dict[int, set[int]]) -> None:
+    """Replace the tags of every given post, like `post.tags.set()` in bulk."""
+    if not links:
+        return
+    post_ids = list(links)
+    pairs = [(post_id, tag_id) for post_id, tags in links.items() for tag_id in tags]
+    link_post_ids = [post_id for post_id, _ in pairs]
+    link_tag_ids = [tag_id for _, tag_id in pairs]
+    table = Post.tags.through._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UNLINK_TAGS_SQL.format(table=table),
+            [post_ids, link_post_ids, link_tag_ids],
+        )
+        if pairs:
+            cursor.execute(
+                LINK_TAGS_SQL.format(table=table), [link_post_ids, link_tag_ids]
+            )
+
+
+def record_metrics(posts: dict[PostKey, int], items: list[dict]) -> None:
+    """Append an engagement snapshot of every written post,
+    see `social_media.engagement`."""
+    # A post repeated by the batch gets one snapshot, of the copy
+    # `upsert_posts` wrote.
+    rows = {(int(item["account_id"]), post_uid(item)): item for item in items}
+    columns: list[list] = [[] for _ in range(4)]
+    for key, pk in posts.items():
+        item = rows[key]
+        values = (
+            pk,
+            _timestamp(item["stored_at"]),
+            item.get("like_count") or 0,
+            item.get("comment_count") or 0,
+        )
+        for column, value in zip(columns, values):
+            column.append(value)
+    if not columns[0]:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            INSERT_METRICS_SQL.format(table=PostMetric._meta.db_table), columns
+        )
+
+
+def bump_versions(posts: dict[PostKey, int]) -> None:
+    """New data version for the accounts of the written posts,
+    see `core.conditional`."""
+    account_ids = {account_id for account_id, _ in posts}
+    if account_ids:
+        Account.objects.filter(id__in=account_ids).update(version=F("version") + 1)
@@ -0,0 +1,51 @@
+"""
+Crawl the whole post history of accounts in the crawlers' backfill lane.
+
+    python -m manage backfill_posts 12 34
+    python -m manage backfill_posts --all
+    python -m manage backfill_posts 12 --restart
+
+Backfills resume from their last stored page, `--restart` walks the history
+again from the newest post. Jobs are published by the outbox relay of the
+running app, the scheduler resumes the ones lost on the way.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from social_media.crawling import start_backfill
+from social_media.models import Account
+
+
+class Command(BaseCommand):
+    help = "Start or resume the historical backfill of accounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("account_ids", nargs="*", type=int)
+        parser.add_argument("--all", action="store_true", help="Backfill every account")
+        parser.add_argument(
+            "--restart", action="store_true", help="Ignore stored checkpoints"
+        )
+
+    def handle(
+        self, *args, account_ids: list[int], all: bool, restart: bool, **options
+    ):
+        if not account_ids and not all:
+            raise CommandError("Pass account ids or --all")
+        accounts = Account.objects.order_by("id")
+        if not all:
+            accounts = accounts.filter(id__in=account_ids)
+            missing = set(account_ids) - set(accounts.values_list("id", flat=True))
+            if missing:
+                raise CommandError(f"Unknown accounts {sorted(missing)}")
+        queued = skipped = 0
+        for account in accounts.iterator():
+            with transaction.atomic():
+                if start_backfill(account, restart=restart):
+                    queued += 1
+                else:
+                    skipped += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Queued {queued} backfills, {skipped} running or finished"
+            )
+        )
@@ -0,0 +1,137 @@
+"""
+Compare `Account.extract` with the grouped query it replaced.
+
+    python -m manage benchmark_extract
+    python -m manage benchmark_extract --accounts 10000 --tags 1000 --follows 1000
+
+One user is subscribed to `--accounts` accounts and follows `--follows` of the
+`--tags` tags on each. The data is created in a transaction rolled back at the
+end, the first page of the accounts list is timed with both queries.
+"""
+import statistics
+import time
+import uuid
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, QuerySet
+from django.db.models.functions import JSONObject
+
+from social_media.models import Account, Tag, UserSubscription
+from users.models import User
+
+LINK_TAGS_SQL = """
+    INSERT INTO {through} (usersubscription_id, tag_id)
+    SELECT s.id, (%(tag_ids)s::bigint[])[1 + (s.n * 7 + j) %% %(tags)s]
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY id) AS n
+        FROM {subscription} WHERE user_id = %(user_id)s
+    ) AS s
+    CROSS JOIN generate_series(0, %(follows)s - 1) AS j
+"""
+
+
+def legacy_extract(user: User, tags_limit: int = None) -> QuerySet:
+    """`Account.extract` before the per account subqueries."""
+    return (
+        Account.objects.filter(subscriptions__user=user.id)
+        .annotate(
+            total_tags=Count("subscriptions__follow_tags", distinct=True),
+            tags_items=ArrayAgg(
+                JSONObject(
+                    id=F("subscriptions__follow_tags__id"),
+                    title=F("subscriptions__follow_tags__title"),
+                ),
+                filter=Q(subscriptions__follow_tags__id__isnull=False),
+                distinct=True,
+                default=[],
+            ),
+        )
+        .annotate(
+            tags=JSONObject(total=F("total_tags"), items=F("tags_items")[:tags_limit])
+        )
+    )
+
+
+class Command(BaseCommand):
+    help = "Time the accounts list query against the grouped one it replaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=10_000)
+        parser.add_argument("--tags", type=int, default=1_000)
+        parser.add_argument("--follows", type=int, default=100, help="Tags per account")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--tags-limit", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options["follows"] > options["tags"]:
+            raise CommandError("--follows can't be above --tags")
+        with transaction.atomic():
+            started = time.monotonic()
+            user = self.seed(options["accounts"], options["tags"], options["follows"])
+            self.stdout.write(f"Seeded in {time.monotonic() - started:.1f}s")
+            page = slice(0, options["page_size"])
+            timings = {}
+            results = {}
+            variants = (("grouped", legacy_extract), ("subquery", Account.extract))
+            for name, extract in variants:
+                queryset = extract(user=user, tags_limit=options["tags_limit"])
+                timings[name], results[name] = self.measure(
+                    queryset, page, options["repeat"]
+                )
+                self.stdout.write(f"{name}: {timings[name] * 1000:.1f} ms per page")
+            if results["grouped"] != results["subquery"]:
+                raise CommandError("The queries returned different pages")
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Speedup x{timings['grouped'] / timings['subquery']:.1f}"
+                )
+            )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def seed(accounts: int, tags: int, follows: int) -> User:
+        prefix = f"benchmark-{uuid.uuid4().hex[:8]}"
+        user = User.objects.create(username=prefix)
+        tag_ids = [
+            tag.id
+            for tag in Tag.objects.bulk_create(
+                Tag(title=f"{prefix}-{i}") for i in range(tags)
+            )
+        ]
+        created = Account.objects.bulk_create(
+            Account(username=f"{prefix}-{i}") for i in range(accounts)
+        )
+        UserSubscription.objects.bulk_create(
+            UserSubscription(user=user, account=account) for account in created
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                LINK_TAGS_SQL.format(
+                    through=UserSubscription.follow_tags.through._meta.db_table,
+                    subscription=UserSubscription._meta.db_table,
+                ),
+                {
+                    "tag_ids": tag_ids,
+                    "tags": tags,
+                    "user_id": user.id,
+                    "follows": follows,
+                },
+            )
+            through = UserSubscription.follow_tags.through
+            for model in (Tag, Account, UserSubscription, through):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+        return user
+
+    @staticmethod
+    def measure(queryset: QuerySet, page: slice, repeat: int) -> tuple[float, list]:
+        timings = []
+        for _ in range(repeat):
+            started = time.monotonic()
+            rows = list(queryset.order_by("-created_at", "-id")[page])
+            timings.append(time.monotonic() - started)
+        # Item order differs between the queries, compare what they hold.
+        result = [(row.id, row.tags["total"], len(row.tags["items"])) for row in rows]
+        return statistics.median(timings), result
@@ -0,0 +1,215 @@
+"""
+Bulk import of historical posts, e.g. when onboarding a big account.
+
+    python -m manage import_posts posts.jsonl
+    python -m manage import_posts posts.csv --chunk-size 200000
+
+Rows have the shape of the crawler's `PostItemSchema`. In CSV files `tags` is
+a JSON array or a comma separated list. Every chunk is streamed into a staging
+table with COPY and merged into posts, tags and post tags with set-based SQL
+in its own transaction, so memory use does not depend on the file size.
+Written posts also get an engagement snapshot, bump the data version of
+their account and reach the feeds of the subscribers like on the ingest path.
+"""
+import csv
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import IO, Iterator
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from social_media.feed import fan_out
+from social_media.ingest import post_fingerprint, post_uid
+from social_media.models import Account, Post, PostMetric, Tag
+
+STAGING = "post_import"
+
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING} (
+        line bigint,
+        account_id bigint,
+        uid varchar(255),
+        likes integer,
+        comments integer,
+        description text,
+        created_at timestamptz,
+        store_at timestamptz,
+        fingerprint varchar(32),
+        tags varchar(255)[]
+    ) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING}_ids (
+        id bigint, account_id bigint, uid varchar(255)
+    ) ON COMMIT DELETE ROWS;
+"""
+
+COPY_SQL = f"""
+    COPY {STAGING} (
+        line, account_id, uid, likes, comments, description, created_at,
+        store_at, fingerprint, tags
+    ) FROM STDIN
+"""
+
+MERGE_TAGS_SQL = """
+    INSERT INTO {tag} (title)
+    SELECT DISTINCT unnest(tags) FROM {staging}
+    ON CONFLICT (title) DO NOTHING
+"""
+
+# A file may repeat a post, the last line wins like in the ingest consumer.
+MERGE_POSTS_SQL = """
+    WITH upserted AS (
+        INSERT INTO {post} (
+            account_id, uid, likes, comments, description, created_at,
+            store_at, fingerprint
+        )
+        SELECT DISTINCT ON (account_id, uid)
+            account_id, uid, likes, comments, description, created_at,
+            store_at, fingerprint
+        FROM {staging}
+        ORDER BY account_id, uid, line DESC
+        ON CONFLICT (account_id, uid) DO UPDATE SET
+            likes = EXCLUDED.likes,
+            comments = EXCLUDED.comments,
+            description = EXCLUDED.description,
+            created_at = EXCLUDED.created_at,
+            store_at = EXCLUDED.store_at,
+            fingerprint = EXCLUDED.fingerprint
+        WHERE {post}.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint
+        RETURNING id, account_id, uid
+    )
+    INSERT INTO {staging}_ids SELECT * FROM upserted
+"""
+
+UNLINK_TAGS_SQL = """
+    DELETE FROM {through} AS t USING {staging}_ids AS u WHERE t.post_id = u.id
+"""
+
+LATEST_SQL = """
+    WITH latest AS (
+        SELECT DISTINCT ON (account_id, uid) *
+        FROM {staging}
+        ORDER BY account_id, uid, line DESC
+    )"""
+
+LINK_TAGS_SQL = (
+    LATEST_SQL
+    + """
+    INSERT INTO {through} (post_id, tag_id)
+    SELECT DISTINCT u.id, tag.id
+    FROM {staging}_ids AS u
+    JOIN latest AS s USING (account_id, uid)
+    CROSS JOIN unnest(s.tags) AS l(title)
+    JOIN {tag} AS tag ON tag.title = l.title
+    ON CONFLICT (post_id, tag_id) DO NOTHING
+"""
+)
+
+BUMP_VERSIONS_SQL = """
+    UPDATE {account} SET version = version + 1
+    WHERE id IN (SELECT DISTINCT account_id FROM {staging}_ids)
+"""
+
+RECORD_METRICS_SQL = (
+    LATEST_SQL
+    + """
+    INSERT INTO {metrics} (post_id, observed_at, likes, comments)
+    SELECT u.id, s.store_at, s.likes, s.comments
+    FROM {staging}_ids AS u
+    JOIN latest AS s USING (account_id, uid)
+"""
+)
+
+
+class Command(BaseCommand):
+    help = "Import posts from a JSONL or CSV file through COPY and set-based merges"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, `-` reads stdin")
+        parser.add_argument("--format", choices=("jsonl", "csv"), default=None)
+        parser.add_argument("--chunk-size", type=int, default=100_000)
+
+    def handle(self, *args, path: str, format: str | None, chunk_size: int, **options):
+        format = format or ("csv" if path.endswith(".csv") else "jsonl")
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        sql = {
+            "staging": STAGING,
+            "post": Post._meta.db_table,
+            "tag": Tag._meta.db_table,
+            "through": Post.tags.through._meta.db_table,
+            "metrics": PostMetric._meta.db_table,
+            "account": Account._meta.db_table,
+        }
+        total = written = 0
+        started = time.monotonic()
+        with stream, connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING_SQL)
+            rows = self.read_rows(stream, format)
+            while chunk := list(islice(rows, chunk_size)):
+                with transaction.atomic():
+                    with cursor.copy(COPY_SQL) as copy:
+                        for row in chunk:
+                            copy.write_row(row)
+                    cursor.execute(f"ANALYZE {STAGING}")
+                    cursor.execute(MERGE_TAGS_SQL.format(**sql))
+                    cursor.execute(MERGE_POSTS_SQL.format(**sql))
+                    written += cursor.rowcount
+                    cursor.execute(f"ANALYZE {STAGING}_ids")
+                    cursor.execute(UNLINK_TAGS_SQL.format(**sql))
+                    cursor.execute(LINK_TAGS_SQL.format(**sql))
+                    cursor.execute(RECORD_METRICS_SQL.format(**sql))
+                    cursor.execute(BUMP_VERSIONS_SQL.format(**sql))
+                    if settings.FEED.fan_out:
+                        cursor.execute(f"SELECT id FROM {STAGING}_ids")
+                        fan_out([pk for pk, in cursor.fetchall()])
+                total += len(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{total} rows read, {written} posts written, "
+                    f"{total / elapsed:.0f} rows/s"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total} rows in {time.monotonic() - started:.1f}s"
+            )
+        )
+
+    def read_rows(self, stream: IO[str], format: str) -> Iterator[tuple]:
+        if format == "csv":
+            records: Iterator[dict] = csv.DictReader(stream)
+        else:
+            records = (json.loads(line) for line in stream if line.strip())
+        now = int(time.time())
+        for line, record in enumerate(records, start=1):
+            try:
+                yield self.to_row(line, record, now)
+            except (KeyError, TypeError, ValueError) as e:
+                raise CommandError(f"Line {line}: invalid row ({e!r})")
+
+    @staticmethod
+    def to_row(line: int, record: dict, now: int) -> tuple:
+        tags = record.get("tags") or []
+        if isinstance(tags, str):
+            tags = json.loads(tags) if tags.startswith("[") else tags.split(",")
+        item = {
+            **record,
+            "tags": [tag.strip() for tag in tags if tag.strip()],
+            "like_count": int(record.get("like_count") or 0),
+            "comment_count": int(record.get("comment_count") or 0),
+        }
+        return (
+            line,
+            int(item["account_id"]),
+            post_uid(item),
+            item["like_count"],
+            item["comment_count"],
+            item.get("description") or "",
+            datetime.fromtimestamp(int(item["created_at"]), tz=timezone.utc),
+            datetime.fromtimestamp(int(item.get("stored_at") or now), tz=timezone.utc),
+            post_fingerprint(item),
+            item["tags"],
+        )
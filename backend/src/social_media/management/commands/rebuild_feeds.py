@@ -0,0 +1,55 @@
+"""
+Write the feeds of users from the posts already stored.
+
+    python -m manage rebuild_feeds
+    python -m manage rebuild_feeds --chunk-size 100
+
+Needed after turning on `FEED__FAN_OUT`, subscriptions and posts changed while
+it was off never reached the feeds. The feeds of every chunk of users are
+cleared and filled with the newest `FEED__MAX_ENTRIES` posts of their
+subscriptions in one transaction.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from social_media.feed import fill_feeds
+from social_media.models import FeedEntry, UserSubscription
+
+
+class Command(BaseCommand):
+    help = "Rebuild the fanned out feeds of all subscribed users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, help="Users per transaction"
+        )
+
+    def handle(self, *args, chunk_size: int, **options):
+        if not settings.FEED.fan_out:
+            raise CommandError("Feeds are merged on read, set FEED__FAN_OUT first")
+        user_ids = list(
+            UserSubscription.objects.order_by("user_id")
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        started = time.monotonic()
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start : start + chunk_size]
+            with transaction.atomic():
+                FeedEntry.objects.filter(user_id__in=chunk).delete()
+                fill_feeds(
+                    list(
+                        UserSubscription.objects.filter(user_id__in=chunk).values_list(
+                            "id", flat=True
+                        )
+                    )
+                )
+            self.stdout.write(f"{start + len(chunk)} of {len(user_ids)} users")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(user_ids)} feeds in {time.monotonic() - started:.1f}s"
+            )
+        )
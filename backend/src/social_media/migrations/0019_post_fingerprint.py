@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0018_alter_usersubscription_follow_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="fingerprint",
+            field=models.CharField(
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="Content fingerprint",
+            ),
+        ),
+    ]
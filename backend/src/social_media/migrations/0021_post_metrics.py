@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+# Declarative partitioning is not supported by Django, the model is unmanaged.
+# Monthly partitions are added by `social_media.engagement.ensure_partitions`,
+# rows outside of them land in the default partition until then.
+CREATE_SQL = """
+    CREATE TABLE social_media_post_metrics (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        post_id bigint NOT NULL
+            REFERENCES social_media_post (id) ON DELETE CASCADE,
+        observed_at timestamptz NOT NULL,
+        likes integer NOT NULL DEFAULT 0 CHECK (likes >= 0),
+        comments integer NOT NULL DEFAULT 0 CHECK (comments >= 0),
+        PRIMARY KEY (id, observed_at)
+    ) PARTITION BY RANGE (observed_at);
+    CREATE INDEX social_media_post_metrics_post_observed
+        ON social_media_post_metrics (post_id, observed_at);
+    CREATE TABLE social_media_post_metrics_default
+        PARTITION OF social_media_post_metrics DEFAULT;
+"""
+
+DROP_SQL = "DROP TABLE social_media_post_metrics"
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0020_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostMetric",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("observed_at", models.DateTimeField(verbose_name="Observed at")),
+                ("likes", models.PositiveIntegerField(default=0, verbose_name="Likes")),
+                (
+                    "comments",
+                    models.PositiveIntegerField(default=0, verbose_name="Comments"),
+                ),
+            ],
+            options={
+                "verbose_name": "Post metric",
+                "verbose_name_plural": "Post metrics",
+                "db_table": "social_media_post_metrics",
+                "managed": False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0021_post_metrics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="last_crawled_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Last crawled at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="last_post_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Last post at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="next_crawl_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Next crawl at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="post_rate",
+            field=models.FloatField(default=0, verbose_name="Posts per hour"),
+        ),
+        migrations.AddIndex(
+            model_name="account",
+            index=models.Index(
+                fields=["provider", "next_crawl_at", "id"],
+                name="social_medi_provide_c881fd_idx",
+            ),
+        ),
+    ]
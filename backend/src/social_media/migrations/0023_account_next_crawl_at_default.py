@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0022_account_crawl_schedule"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="account",
+            name="next_crawl_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, verbose_name="Next crawl at"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0023_account_next_crawl_at_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="last_post_uid",
+            field=models.CharField(
+                blank=True,
+                max_length=255,
+                null=True,
+                verbose_name="Last post provider ID",
+            ),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0024_account_last_post_uid"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawlJob",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("QUEUED", "Queued"),
+                            ("RUNNING", "Running"),
+                            ("DONE", "Done"),
+                            ("FAILED", "Failed"),
+                            ("EXPIRED", "Expired"),
+                        ],
+                        default="QUEUED",
+                        max_length=16,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Started at"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Finished at"
+                    ),
+                ),
+                ("lease_until", models.DateTimeField(verbose_name="Lease until")),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="crawl_jobs",
+                        to="social_media.account",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Crawl job",
+                "verbose_name_plural": "Crawl jobs",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status__in", ["QUEUED", "RUNNING"])),
+                        fields=["lease_until"],
+                        name="crawl_job_live_lease_idx",
+                    ),
+                    models.Index(
+                        fields=["finished_at"], name="crawl_job_finished_at_idx"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status__in", ["QUEUED", "RUNNING"])),
+                        fields=("account",),
+                        name="unique_live_crawl_job",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0025_crawljob"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="crawljob",
+            name="unique_live_crawl_job",
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="backfill_cursor",
+            field=models.TextField(
+                blank=True, null=True, verbose_name="Backfill cursor"
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="backfill_finished_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Backfill finished at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="backfill_started_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Backfill started at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="crawljob",
+            name="kind",
+            field=models.CharField(
+                choices=[("CRAWL", "Crawl"), ("BACKFILL", "Backfill")],
+                default="CRAWL",
+                max_length=16,
+                verbose_name="Kind",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="crawljob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["QUEUED", "RUNNING"])),
+                fields=("account", "kind"),
+                name="unique_live_crawl_job",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0026_backfill"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="version",
+            field=models.BigIntegerField(default=0, verbose_name="Data version"),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0027_account_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="usersubscription",
+            index=models.Index(
+                fields=["user", "account"], name="social_medi_user_id_bdc03a_idx"
+            ),
+        ),
+    ]
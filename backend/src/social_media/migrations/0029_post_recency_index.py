@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0028_subscription_user_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["account", "-created_at", "-id"],
+                name="social_medi_account_7bc9e6_idx",
+            ),
+        ),
+    ]
@@ -1,9 +1,12 @@
 import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from django.db.models import F, Q, Count
-from django.db.models.functions import JSONObject
-from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import F, Q, Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce, JSONObject
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import ArrayField
 
 from core.db.models import DBModel
 from users.models import User
@@ -20,12 +23,33 @@ class UserSubscription(DBModel):
     class Meta:
         verbose_name = _("User Subscription")
         verbose_name_plural = _("User Subscription")
-        indexes = (models.Index(fields=["account", "user"]),)
+        indexes = (
+            models.Index(fields=["account", "user"]),
+            models.Index(fields=["user", "account"]),
+        )
 
     def __str__(self) -> str:
         return f"{self.account.username} - {self.user.username}"
 
 
+def _tags_object(links: models.QuerySet, owner: str, limit: int = None) -> JSONObject:
+    """`{"total", "items"}` of the tags linked to one row by the through table
+    rows `links`, built by correlated subqueries: a LIMIT on the items and a
+    count for the total, so no tag is grouped or deduplicated."""
+    links = links.order_by()
+    return JSONObject(
+        total=Coalesce(
+            Subquery(links.values(owner).annotate(total=Count("*")).values("total")),
+            0,
+        ),
+        items=ArraySubquery(
+            links.order_by("tag_id").values(
+                json=JSONObject(id="tag_id", title="tag__title")
+            )[:limit]
+        ),
+    )
+
+
 class Account(DBModel):
     """Account model"""
 
@@ -38,11 +62,32 @@ class Account(DBModel):
     provider = models.CharField(
         _("Provider social media"), max_length=255, choices=Provider.choices, default=Provider.INSTAGRAM
     )
+    # Crawl scheduling state, see `social_media.crawling`.
+    next_crawl_at = models.DateTimeField(_("Next crawl at"), default=timezone.now)
+    last_crawled_at = models.DateTimeField(_("Last crawled at"), null=True, blank=True)
+    last_post_at = models.DateTimeField(_("Last post at"), null=True, blank=True)
+    last_post_uid = models.CharField(
+        _("Last post provider ID"), max_length=255, null=True, blank=True
+    )
+    post_rate = models.FloatField(_("Posts per hour"), default=0)
+    # Resumable crawl of the whole history, see `social_media.crawling`.
+    backfill_cursor = models.TextField(_("Backfill cursor"), null=True, blank=True)
+    backfill_started_at = models.DateTimeField(
+        _("Backfill started at"), null=True, blank=True
+    )
+    backfill_finished_at = models.DateTimeField(
+        _("Backfill finished at"), null=True, blank=True
+    )
+    # Bumped whenever its posts are written, see `core.conditional`.
+    version = models.BigIntegerField(_("Data version"), default=0)
 
     class Meta:
         verbose_name = _("Account")
         verbose_name_plural = _("Accounts")
-        indexes = (models.Index(fields=["provider", "username"]),)
+        indexes = (
+            models.Index(fields=["provider", "username"]),
+            models.Index(fields=["provider", "next_crawl_at", "id"]),
+        )
         ordering = ("-created_at",)
 
     def __str__(self) -> str:
@@ -50,24 +95,17 @@ class Account(DBModel):
 
     @classmethod
     def extract(cls, user: User, tags_limit: int = None):
+        """Accounts followed by `user` with the tags it follows on them.
+        The tags are read per account by correlated subqueries on the
+        subscription, a LIMIT on the one building the items and a count on the
+        other, so nothing is grouped or deduplicated across the accounts."""
+        links = UserSubscription.follow_tags.through.objects.filter(
+            usersubscription=OuterRef("subscriptions__id")
+        )
         return cls.objects.filter(
             subscriptions__user=user.id
         ).annotate(
-            total_tags=Count("subscriptions__follow_tags", distinct=True),
-            tags_items=ArrayAgg(
-                JSONObject(
-                    id=F("subscriptions__follow_tags__id"),
-                    title=F("subscriptions__follow_tags__title"),
-                ),
-                filter=Q(subscriptions__follow_tags__id__isnull=False),
-                distinct=True,
-                default=[]
-            )
-        ).annotate(
-            tags=JSONObject(
-                total=F("total_tags"),
-                items=F("tags_items")[:tags_limit]
-            )
+            tags=_tags_object(links, "usersubscription", tags_limit)
         )
 
 
@@ -97,6 +135,7 @@ class Post(DBModel):
     store_at = models.DateTimeField(_("Updated at"), auto_now=True)
     tags = models.ManyToManyField(Tag, related_name="posts")
     uid = models.CharField(_("Provider ID"), max_length=255, null=True)
+    fingerprint = models.CharField(_("Content fingerprint"), max_length=32, null=True, editable=False)
 
     class Meta:
         verbose_name = _("Post")
@@ -104,31 +143,167 @@ class Post(DBModel):
         constraints = [
             models.UniqueConstraint(fields=['account', 'uid'], name='unique_account_provider_uid')
         ]
+        indexes = (models.Index(fields=["account", "-created_at", "-id"]),)
 
     def __str__(self) -> str:
         return str(self.id)
 
     @classmethod
-    def extract(cls, user: User):
+    def extract(cls, user: User, tags_limit: int = None):
+        """Posts of the accounts followed by `user`, newest first.
+        The order is served by the `(account, -created_at, -id)` index and the
+        tags are read per post by subqueries, evaluated only for the rows of
+        the page."""
         fields = cls.get_fields()
         fields.remove('tags')
         fields.remove('account')
-        return cls.objects.filter(
-            account__subscriptions__user=user.id
-        ).select_related('account').values(*fields).annotate(
+        fields.remove('metrics')
+        fields.remove('fingerprint')
+        subscribed = UserSubscription.objects.filter(
+            account=OuterRef("account_id"), user=user.id
+        )
+        links = cls.tags.through.objects.filter(post=OuterRef("id"))
+        return cls.objects.filter(Exists(subscribed)).values(*fields).annotate(
             username=F("account__username"),
-            tags=JSONObject(
-                total=Count("tags__id", distinct=True),
-                items=ArrayAgg(
-                    JSONObject(
-                        id=F("tags__id"),
-                        title=F("tags__title"),
-                    ),
-                    filter=Q(tags__id__isnull=False),
-                    distinct=True,
-                    default=[],
-                    offset=0,
-                    limit=1
-                )
+            tags=_tags_object(links, "post", tags_limit),
+        ).order_by("-created_at", "-id")
+
+
+class FeedEntry(DBModel):
+    """Post copied to the feed of a subscriber when it is stored, used instead
+    of merging the subscribed accounts if `FEED.fan_out`, see
+    `social_media.feed`. Only the newest `FEED.max_entries` are kept."""
+
+    id = models.BigAutoField(primary_key=True)
+    # Indexed by the recency index, one more index is one more write per entry.
+    user = models.ForeignKey(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        db_index=False,
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField(_("Post created at"))
+    # Tags of the post the user follows on its account.
+    matched_tags = ArrayField(models.BigIntegerField(), default=list, blank=True)
+
+    class Meta:
+        verbose_name = _("Feed entry")
+        verbose_name_plural = _("Feed entries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_feed_entry_user_post"
             )
+        ]
+        indexes = (
+            models.Index(
+                fields=["user", "-created_at", "-post"], name="feed_entry_recency_idx"
+            ),
+            models.Index(
+                fields=["user", "-created_at", "-post"],
+                condition=~Q(matched_tags=[]),
+                name="feed_entry_tagged_idx",
+            ),
         )
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: {self.post_id}"
+
+
+class PostMetric(DBModel):
+    """Engagement snapshot written every time a refresh changes a post.
+    The table is range partitioned by month on `observed_at` outside of
+    Django, see `social_media.engagement`."""
+
+    id = models.BigAutoField(primary_key=True)
+    # The cascade is done by the database, collecting the history in Python
+    # would load every snapshot of the deleted posts.
+    post = models.ForeignKey(
+        Post, on_delete=models.DO_NOTHING, db_constraint=False, related_name="metrics"
+    )
+    observed_at = models.DateTimeField(_("Observed at"))
+    likes = models.PositiveIntegerField(_("Likes"), default=0)
+    comments = models.PositiveIntegerField(_("Comments"), default=0)
+
+    class Meta:
+        managed = False
+        db_table = "social_media_post_metrics"
+        verbose_name = _("Post metric")
+        verbose_name_plural = _("Post metrics")
+
+    def __str__(self) -> str:
+        return f"{self.post_id} at {self.observed_at}"
+
+
+class CrawlJob(DBModel):
+    """Crawl of an account handed to the crawlers, see `social_media.crawling`.
+    An account has at most one live job of each kind, a job whose lease ended
+    is expired."""
+
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", _("Queued")
+        RUNNING = "RUNNING", _("Running")
+        DONE = "DONE", _("Done")
+        FAILED = "FAILED", _("Failed")
+        EXPIRED = "EXPIRED", _("Expired")
+
+    class Kind(models.TextChoices):
+        CRAWL = "CRAWL", _("Crawl")
+        BACKFILL = "BACKFILL", _("Backfill")
+
+    LIVE = (Status.QUEUED, Status.RUNNING)
+
+    id = models.BigAutoField(primary_key=True)
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="crawl_jobs"
+    )
+    kind = models.CharField(
+        _("Kind"), max_length=16, choices=Kind.choices, default=Kind.CRAWL
+    )
+    status = models.CharField(
+        _("Status"), max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    started_at = models.DateTimeField(_("Started at"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished at"), null=True, blank=True)
+    lease_until = models.DateTimeField(_("Lease until"))
+
+    class Meta:
+        verbose_name = _("Crawl job")
+        verbose_name_plural = _("Crawl jobs")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "kind"],
+                condition=Q(status__in=["QUEUED", "RUNNING"]),
+                name="unique_live_crawl_job",
+            )
+        ]
+        indexes = (
+            models.Index(
+                fields=["lease_until"],
+                condition=Q(status__in=["QUEUED", "RUNNING"]),
+                name="crawl_job_live_lease_idx",
+            ),
+            models.Index(fields=["finished_at"], name="crawl_job_finished_at_idx"),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.account_id}: {self.status}"
+
+
+class OutboxMessage(DBModel):
+    """Broker message written in the same transaction as the data it is about,
+    published later by `social_media.outbox.OutboxRelay`."""
+
+    id = models.BigAutoField(primary_key=True)
+    queue = models.CharField(_("Queue"), max_length=255)
+    payload = models.JSONField(_("Payload"), encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    locked_until = models.DateTimeField(_("Locked until"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Outbox message")
+        verbose_name_plural = _("Outbox messages")
+
+    def __str__(self) -> str:
+        return f"{self.queue}: {self.id}"
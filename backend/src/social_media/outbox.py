@@ -0,0 +1,107 @@
+"""
+Transactional outbox for messages produced while ingesting and scheduling.
+Messages are stored with `enqueue` inside the writing transaction and the relay
+publishes them in batches once committed, so a crash between the commit and
+the publish can't lose them. Delivery is at least once.
+"""
+import asyncio
+import json
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from loguru import logger
+
+from core.broker import broker
+from core.db.utils import atomic_in_thread
+from social_media.models import OutboxMessage
+
+__all__ = ("enqueue", "OutboxRelay", "outbox_relay")
+
+CLAIM_SQL = """
+    UPDATE {table} SET locked_until = now() + %s * interval '1 second'
+    WHERE id IN (
+        SELECT id FROM {table}
+        WHERE locked_until IS NULL OR locked_until < now()
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, queue, payload
+"""
+
+
+def enqueue(messages: list[tuple[str, dict]]) -> None:
+    """Store `(queue, payload)` pairs, the caller owns the transaction."""
+    if not messages:
+        return
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(queue=queue, payload=payload) for queue, payload in messages]
+    )
+    transaction.on_commit(outbox_relay.wake)
+
+
+class OutboxRelay:
+    """Drains the outbox through the broker channel, which waits for publisher
+    confirms. Rows are claimed for `lease` seconds and deleted once confirmed,
+    rows of a relay that died are picked up again when the lease ends."""
+
+    def __init__(self, batch_size: int, poll_interval: float, lease: int) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def wake(self) -> None:
+        """Called after commit, possibly from a worker thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    def _claim(self) -> list[tuple[int, str, dict]]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CLAIM_SQL.format(table=OutboxMessage._meta.db_table),
+                [self.lease, self.batch_size],
+            )
+            rows = cursor.fetchall()
+        return [
+            (pk, queue, json.loads(payload) if isinstance(payload, str) else payload)
+            for pk, queue, payload in sorted(rows)
+        ]
+
+    async def drain(self) -> int:
+        """Publish one batch, returns the number of published messages."""
+        rows = await atomic_in_thread(self._claim)
+        if not rows:
+            return 0
+        await asyncio.gather(
+            *(
+                broker.publish(message=payload, queue=queue)
+                for _, queue, payload in rows
+            )
+        )
+        await OutboxMessage.objects.filter(id__in=[pk for pk, *_ in rows]).adelete()
+        logger.info(f"Outbox published {len(rows)} messages")
+        return len(rows)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                while await self.drain() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+            try:
+                await asyncio.wait_for(self._event.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._event.clear()
+
+
+outbox_relay = OutboxRelay(
+    batch_size=settings.OUTBOX.batch_size,
+    poll_interval=settings.OUTBOX.poll_interval,
+    lease=settings.OUTBOX.lease,
+)
@@ -1,61 +1,151 @@
-from datetime import datetime, timezone
+from collections import defaultdict
+from uuid import UUID
+
+from django.conf import settings
 from loguru import logger
 
-from core.broker import broker
-from core.db.utils import AsyncAtomicContextManager, AsyncModelUtils
-from social_media.models import Post, Tag, Account
+from core.broker import broker, consumer_limiter
+from core.broker.batching import MessageBatcher
+from core.db.utils import atomic_in_thread
+from social_media.crawling import (
+    claim_due_accounts,
+    expire_jobs,
+    fail_job,
+    observe_backfills,
+    observe_crawls,
+    resume_backfills,
+    start_job,
+)
+from social_media.feed import fan_out
+from social_media.follows import follow_index
+from social_media.ingest import (
+    PostKey,
+    bump_versions,
+    link_tags,
+    post_uid,
+    record_metrics,
+    resolve_tags,
+    upsert_posts,
+)
+from social_media.models import Account
+from social_media.outbox import enqueue
 from users.models import TelegramAccount
 
 
+def store_posts(batch: list[dict]) -> None:
+    """Write the crawled messages and queue their notifications,
+    the caller owns the transaction. Backfilled pages are old posts, they are
+    checkpointed instead of notified."""
+    crawls = [data for data in batch if not data.get('backfill')]
+    backfills = [data for data in batch if data.get('backfill')]
+    items = [item for data in batch for item in data['items']]
+    posts, inserted = upsert_posts(items)
+    tags = resolve_tags({tag for item in items for tag in item['tags']})
+    # Unchanged posts are skipped by the upsert, their tags are the same too.
+    link_tags({
+        posts[key]: {tags[t] for t in i['tags']}
+        for i in items if (key := (int(i['account_id']), post_uid(i))) in posts
+    })
+    record_metrics(posts, items)
+    if settings.FEED.fan_out:
+        fan_out(posts.values())
+    bump_versions(posts)
+    observe_crawls(crawls)
+    observe_backfills(backfills)
+    logger.info(f"Saved {len(posts)} posts, {len(items) - len(posts)} unchanged")
+    enqueue([
+        message for data in crawls for message in notifications(data, tags, inserted)
+    ])
+
+
+async def store_posts_batch(batch: list[dict]) -> None:
+    await follow_index.refresh()
+    await atomic_in_thread(store_posts, batch)
+    logger.info(f"Committed batch of {len(batch)} messages")
+
+
+posts_batcher = MessageBatcher(
+    store_posts_batch,
+    max_size=settings.INGEST.batch.max_size,
+    max_wait=settings.INGEST.batch.max_wait_ms / 1000,
+)
+
+
 @broker.subscriber(queue="instagram:posts:save")
 async def save_posts(data: dict) -> None:
-    items = data['items']
-    pool_tags = set()
-    async with AsyncAtomicContextManager():
-        for item in items:
-            uid = item['id'].split('_')[0]
-            obj, status = await Post.objects.aupdate_or_create(
-                account_id=item['account_id'],
-                uid=uid,
-                defaults={
-                    "likes": item['like_count'],
-                    "comments": item['comment_count'],
-                    "description": item['description'],
-                    "created_at": datetime.fromtimestamp(item['created_at'], tz=timezone.utc),
-                    "store_at": datetime.fromtimestamp(item['stored_at'], tz=timezone.utc)
-                }
-            )
-            logger.info(f"Post id = {obj.id} saved uid = {uid} for account id = {item['account_id']}")
-        pool_tags.update(item['tags'])
-        multi = AsyncModelUtils(Tag, [{"title": i} for i in item['tags']], 'title')
-        tags = await multi.update_or_create()
-        await obj.tags.aset(tags)
-    follow_tags = {
-        i.title for i in Tag.objects.filter(
-            followed_by__isnull=False,
-            followed_by__account_id=data['account_id']
-        ).distinct()
-    }
-    match_tags = follow_tags.intersection(pool_tags)
-    if not match_tags:
+    if settings.INGEST.batch.enabled:
+        # Returns after the shared transaction is committed, so the message is
+        # acked only once its posts are stored.
+        await posts_batcher.submit(data, size=len(data['items']))
         return
-    logger.info(f"Data push to Telegram")
-    async for tg in TelegramAccount.objects.filter(is_active=True):
-        data['tg_id'] = tg.id
-        data['find_tags'] = match_tags
-        await broker.publish(queue=f'telegram:notifications', message=data)
+    # Different accounts are stored in parallel, one account in order.
+    async with consumer_limiter.acquire(('posts', data['account_id'])):
+        await follow_index.refresh()
+        await atomic_in_thread(store_posts, [data])
 
 
-async def push_accounts():
-    async for account in Account.objects.all():
-        await broker.publish(queue=f'crawler:input:{account.provider.lower()}', message={
-            "callback": "start",
-            "metadata": {
-                "page_size": 10,
-                "max_pages": 1,
-                "username": account.username,
-                "account_id": account.id
-            }
+@broker.subscriber(queue="crawler:jobs:status")
+async def update_crawl_job(data: dict) -> None:
+    """`{"job_id": 1, "status": "running" | "failed"}` sent by the crawlers,
+    finished jobs are closed by `save_posts`."""
+    if data['status'] == 'running':
+        await atomic_in_thread(start_job, data['job_id'])
+    elif data['status'] == 'failed':
+        await atomic_in_thread(fail_job, data['job_id'])
+
+
+def notifications(
+        data: dict, tags: dict[str, int], inserted: set[PostKey]
+) -> list[tuple[str, dict]]:
+    """Telegram messages for the users following tags found in the posts of
+    `data` first stored now, refreshed posts were notified before."""
+    items = [
+        item for item in data['items']
+        if (int(data['account_id']), post_uid(item)) in inserted
+    ]
+    recipients: dict[UUID, set[int]] = defaultdict(set)
+    for item in items:
+        tag_ids = (tags[i] for i in item['tags'])
+        users = follow_index.recipients(data['account_id'], tag_ids)
+        for user_id, matched in users.items():
+            recipients[user_id].update(matched)
+    if not recipients:
+        return []
+    titles = {tag_id: title for title, tag_id in tags.items()}
+    # Chats no user linked are prompted to link when saved, see `users.registry`.
+    chats = TelegramAccount.objects.filter(
+        user_id__in=recipients, is_active=True
+    ).values_list('id', 'user_id')
+    return [
+        ('telegram:notifications', {
+            **data,
+            'items': items,
+            'tg_id': tg_id,
+            'find_tags': sorted(titles[i] for i in recipients[user_id]),
         })
+        for tg_id, user_id in chats
+    ]
+
 
-    logger.info("Pushed accounts to queue.")
+async def push_accounts():
+    """Publish crawls of the accounts that are due, see `social_media.crawling`.
+    Runs in the scheduler leader only, each page is claimed in its own
+    transaction and published by the outbox relay in batches."""
+    config = settings.CRAWLER
+    expired = await atomic_in_thread(expire_jobs)
+    if expired:
+        logger.warning(f"Expired {expired} crawl jobs without a result.")
+    for provider in Account.Provider.values:
+        budget = max(1, config.budget // config.max_pages)
+        total, after = 0, None
+        while total < budget:
+            limit = min(config.claim_size, budget - total)
+            keys = await atomic_in_thread(claim_due_accounts, provider, limit, after)
+            total += len(keys)
+            if len(keys) < limit:
+                break
+            after = keys[-1]
+        logger.info(f"Pushed {total} due {provider} accounts to queue.")
+    resumed = await atomic_in_thread(resume_backfills, config.backfill_budget)
+    if resumed:
+        logger.info(f"Resumed {resumed} interrupted backfills.")
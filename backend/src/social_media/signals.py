@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from social_media.feed import drop_feed_entries, fill_feeds
+from social_media.follows import follow_index
+from social_media.ingest import tag_cache
+from social_media.models import Tag, UserSubscription
+from users.models import User
+
+
+@receiver(m2m_changed, sender=UserSubscription.follow_tags.through)
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def invalidate_follow_index(**kwargs) -> None:
+    transaction.on_commit(follow_index.invalidate)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def forget_tags(created: bool = False, **kwargs) -> None:
+    """A renamed or deleted tag must not be resolved to its old id, new tags
+    don't change the cached ones."""
+    if not created:
+        transaction.on_commit(tag_cache.clear)
+
+
+@receiver(m2m_changed, sender=UserSubscription.follow_tags.through)
+def remember_cleared(instance, action: str, **kwargs) -> None:
+    """`post_clear` has no `pk_set`, the subscriptions following a tag cleared
+    from the tag side are kept on the tag for it."""
+    if action == "pre_clear" and isinstance(instance, Tag):
+        instance._cleared_subscriptions = list(
+            instance.followed_by.values_list("id", flat=True)
+        )
+
+
+def _subscription_ids(instance: Tag, action: str, pk_set) -> list:
+    """Subscriptions whose tags changed from the tag side."""
+    if action == "post_clear":
+        return getattr(instance, "_cleared_subscriptions", [])
+    return list(pk_set or ())
+
+
+@receiver(m2m_changed, sender=UserSubscription.follow_tags.through)
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def bump_data_version(instance, action: str = "post_", **kwargs) -> None:
+    """The responses of the subscribed user changed, see `core.conditional`."""
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, UserSubscription):
+        users = User.objects.filter(id=instance.user_id)
+    else:
+        # Tags followed from the tag side.
+        subscriptions = UserSubscription.objects.filter(
+            id__in=_subscription_ids(instance, action, kwargs["pk_set"])
+        )
+        users = User.objects.filter(id__in=subscriptions.values("user_id"))
+    users.update(data_version=F("data_version") + 1)
+
+
+@receiver(m2m_changed, sender=UserSubscription.follow_tags.through)
+@receiver(post_save, sender=UserSubscription)
+def fill_feed(instance, action: str = "post_", created: bool = True, **kwargs) -> None:
+    """Posts of a new subscription and tags of a changed one in the feed of the
+    user, see `social_media.feed`."""
+    if not settings.FEED.fan_out or not action.startswith("post_") or not created:
+        return
+    if isinstance(instance, UserSubscription):
+        fill_feeds([instance.id])
+    else:
+        fill_feeds(_subscription_ids(instance, action, kwargs["pk_set"]))
+
+
+@receiver(post_delete, sender=UserSubscription)
+def drop_feed(instance: UserSubscription, **kwargs) -> None:
+    if settings.FEED.fan_out:
+        drop_feed_entries(instance.user_id, instance.account_id)
@@ -1,3 +1,236 @@
-from django.test import TestCase
+import asyncio
+from datetime import datetime, timezone
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.broker.batching import MessageBatcher
+from core.broker.concurrency import KeyedLimiter
+from core.errors.exceptions import InvalidCursor
+from core.pagination.query import decode_cursor, encode_cursor
+from server.settings._dantic import FeedSettings
+from social_media.feed import fan_out
+from social_media.ingest import link_tags, resolve_tags, tag_cache, upsert_posts
+from social_media.models import Account, FeedEntry, Post, Tag, UserSubscription
+from users.models import User
+
+
+class MessageBatcherTests(SimpleTestCase):
+    async def test_flushes_full_batch_once(self):
+        flushed = []
+
+        async def flush(messages):
+            flushed.append(list(messages))
+
+        batcher = MessageBatcher(flush, max_size=3, max_wait=10)
+        await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+        self.assertEqual(flushed, [[0, 1, 2]])
+
+    async def test_flushes_after_max_wait(self):
+        flushed = []
+
+        async def flush(messages):
+            flushed.extend(messages)
+
+        batcher = MessageBatcher(flush, max_size=100, max_wait=0.01)
+        await asyncio.wait_for(batcher.submit("a"), timeout=1)
+        self.assertEqual(flushed, ["a"])
+
+    async def test_poison_message_fails_alone(self):
+        stored = []
+
+        async def flush(messages):
+            if "bad" in messages:
+                raise ValueError("missing created_at")
+            stored.extend(messages)
+
+        batcher = MessageBatcher(flush, max_size=4, max_wait=10)
+        results = await asyncio.gather(
+            *(batcher.submit(i) for i in ("a", "bad", "b", "c")),
+            return_exceptions=True,
+        )
+        self.assertEqual(results[0], None)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2:], [None, None])
+        # The order of the messages is kept.
+        self.assertEqual(stored, ["a", "b", "c"])
+
+
+class KeyedLimiterTests(SimpleTestCase):
+    async def test_limits_handlers_running_at_once(self):
+        limiter = KeyedLimiter(2)
+        running, peak = 0, 0
+
+        async def handle(key):
+            nonlocal running, peak
+            async with limiter.acquire(key):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(handle(key) for key in range(6)))
+        self.assertEqual(peak, 2)
+
+    async def test_same_key_runs_in_arrival_order(self):
+        limiter = KeyedLimiter(4)
+        handled = []
+
+        async def handle(key, message, delay=0.0):
+            async with limiter.acquire(key):
+                await asyncio.sleep(delay)
+                handled.append((key, message))
+
+        await asyncio.gather(
+            handle("a", 0, delay=0.01), handle("a", 1), handle("a", 2), handle("b", 0)
+        )
+        self.assertEqual([m for key, m in handled if key == "a"], [0, 1, 2])
+        # Another key does not wait for the first one.
+        self.assertLess(handled.index(("b", 0)), handled.index(("a", 0)))
+        # Locks of finished keys are released.
+        self.assertEqual(limiter._locks, {})
+
+
+class KeysetCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        created_at = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        cursor = encode_cursor((created_at, 42))
+        self.assertEqual(
+            decode_cursor(cursor, 2), ([created_at.isoformat(), 42], False)
+        )
+
+    def test_backward_cursor(self):
+        cursor = encode_cursor(("a", 1), backward=True)
+        self.assertEqual(decode_cursor(cursor, 2), (["a", 1], True))
+
+    def test_invalid_cursor(self):
+        for cursor in ("", "not a cursor", "e30", encode_cursor((1,))):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, 2)
+
+
+def post_item(account: Account, uid: str, likes: int = 0, created_at: int = 0) -> dict:
+    return {
+        "id": f"{uid}_1",
+        "description": "",
+        "like_count": likes,
+        "comment_count": 0,
+        "tags": [],
+        "created_at": 1_700_000_000 + created_at,
+        "stored_at": 1_700_000_000,
+        "account_id": account.id,
+    }
+
+
+class UpsertPostsTests(TestCase):
+    def setUp(self):
+        self.account = Account.objects.create(username="ingest")
+
+    def test_second_ingest_skips_unchanged_posts(self):
+        items = [post_item(self.account, "1"), post_item(self.account, "2")]
+        written, inserted = upsert_posts(items)
+        self.assertEqual(set(written), {(self.account.id, "1"), (self.account.id, "2")})
+        self.assertEqual(inserted, set(written))
+
+        self.assertEqual(upsert_posts(items), ({}, set()))
+
+        changed = post_item(self.account, "1", likes=5)
+        written_again, inserted = upsert_posts([changed, items[1]])
+        self.assertEqual(
+            written_again, {(self.account.id, "1"): written[(self.account.id, "1")]}
+        )
+        self.assertEqual(inserted, set())
+        self.assertEqual(Post.objects.get(id=written[(self.account.id, "1")]).likes, 5)
+
+    def test_last_copy_of_a_repeated_post_wins(self):
+        items = [
+            post_item(self.account, "1", likes=1),
+            post_item(self.account, "1", likes=2),
+        ]
+        written, _ = upsert_posts(items)
+        self.assertEqual(len(written), 1)
+        self.assertEqual(Post.objects.get(id=written[(self.account.id, "1")]).likes, 2)
+
+
+class ResolveTagsTests(TestCase):
+    def setUp(self):
+        tag_cache.clear()
+        self.addCleanup(tag_cache.clear)
+
+    def test_existing_tags_are_read_after_the_conflict(self):
+        existing = Tag.objects.create(title="cats")
+        tags = resolve_tags({"cats", "dogs"})
+        self.assertEqual(tags["cats"], existing.id)
+        self.assertEqual(Tag.objects.get(title="dogs").id, tags["dogs"])
+        tag_cache.clear()
+        self.assertEqual(resolve_tags({"cats", "dogs"}), tags)
+        self.assertEqual(Tag.objects.count(), 2)
+
+
+@override_settings(FEED=FeedSettings(fan_out=True, max_entries=2))
+class FanOutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="secret")
+        self.account = Account.objects.create(username="fanned")
+        self.subscription = UserSubscription.objects.create(
+            user=self.user, account=self.account
+        )
+
+    def store(self, *items: dict) -> dict:
+        written, _ = upsert_posts(list(items))
+        tags = resolve_tags({tag for item in items for tag in item["tags"]})
+        link_tags(
+            {
+                written[(self.account.id, item["id"].split("_")[0])]: {
+                    tags[tag] for tag in item["tags"]
+                }
+                for item in items
+            }
+        )
+        fan_out(written.values())
+        return written
+
+    def entries(self) -> list[FeedEntry]:
+        return list(
+            FeedEntry.objects.filter(user=self.user).order_by("-created_at", "-post_id")
+        )
+
+    def test_feed_is_trimmed_to_max_entries(self):
+        written = self.store(
+            *(post_item(self.account, str(i), created_at=i) for i in range(3))
+        )
+        self.assertEqual(
+            [entry.post_id for entry in self.entries()],
+            [written[(self.account.id, "2")], written[(self.account.id, "1")]],
+        )
+        newer = self.store(post_item(self.account, "3", created_at=3))
+        self.assertEqual(
+            [entry.post_id for entry in self.entries()],
+            [newer[(self.account.id, "3")], written[(self.account.id, "2")]],
+        )
+
+    def test_matched_tags_follow_the_subscription(self):
+        tag_cache.clear()
+        self.addCleanup(tag_cache.clear)
+        item = {**post_item(self.account, "1"), "tags": ["cats", "dogs"]}
+        self.store(item)
+        [entry] = self.entries()
+        self.assertEqual(entry.matched_tags, [])
+
+        cats = Tag.objects.get(title="cats")
+        self.subscription.follow_tags.add(cats)
+        entry.refresh_from_db()
+        self.assertEqual(entry.matched_tags, [cats.id])
+
+        self.subscription.follow_tags.remove(cats)
+        entry.refresh_from_db()
+        self.assertEqual(entry.matched_tags, [])
+
+    def test_new_subscription_fills_the_feed(self):
+        other = Account.objects.create(username="other")
+        posts = [post_item(other, str(i), created_at=i) for i in range(3)]
+        written, _ = upsert_posts(posts)
+        UserSubscription.objects.create(user=self.user, account=other)
+        self.assertEqual(
+            {entry.post_id for entry in self.entries()},
+            {written[(other.id, "2")], written[(other.id, "1")]},
+        )
@@ -39,10 +39,12 @@ class AdminTelegramAccount(admin.ModelAdmin):
     list_display = (
         "id",
         "username",
+        "user",
         "created_at",
         "is_active",
     )
     readonly_fields = ("created_at",)
+    raw_id_fields = ("user",)
 
 
 # Register your models here.
@@ -6,12 +6,13 @@ from core.schemas import HTTPException, MessageResponse, Response
 from users.api.auth.security import user_auth
 from users.api.schemas import (
     BaseUserResponseSchema,
+    TelegramLinkSchemaResponse,
     TokenSchemaResponse,
     UserResponseSchema,
     UserSingInSchema,
     UserSingUpSchema,
 )
-from users.models import User
+from users.models import TelegramAccount, User
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -56,6 +57,18 @@ async def get_account(user: User = Depends(user_auth.get_current_user)):
     return Response[UserResponseSchema](data=UserResponseSchema.model_validate(user))
 
 
+@router.get(
+    path="/telegram-link", response_model=Response[TelegramLinkSchemaResponse]
+)
+async def get_telegram_link(user: User = Depends(user_auth.get_current_user)):
+    """Token linking a Telegram chat to the user, only linked chats are notified
+    of the tags the user follows"""
+    token = TelegramAccount.link_token(user.id)
+    return Response[TelegramLinkSchemaResponse](
+        data=TelegramLinkSchemaResponse(token=token)
+    )
+
+
 @router.delete(
     path="/logout",
     response_model=Response[MessageResponse[str]],
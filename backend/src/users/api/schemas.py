@@ -51,6 +51,13 @@ class TokenSchemaResponse(PublicSchema):
     )
 
 
+class TelegramLinkSchemaResponse(PublicSchema):
+    """Sent to the bot as `/start <token>`, e.g. `https://t.me/<bot>?start=<token>`,
+    within 15 minutes"""
+
+    token: str
+
+
 class BaseUserResponseSchema(PublicSchema):
     id: UUID
     model_config = ConfigDict(
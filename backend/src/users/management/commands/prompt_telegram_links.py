@@ -0,0 +1,26 @@
+"""
+Ask every active chat no user linked yet to open the link of a profile.
+
+    python -m manage prompt_telegram_links
+
+Chats are only notified of the tags their user follows, the chats saved before
+users could link them get nothing until they do. New chats are prompted by the
+bot when they start it. Prompts are published by the outbox relay of the
+running app.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from social_media.outbox import enqueue
+from users.models import TelegramAccount
+
+
+class Command(BaseCommand):
+    help = "Prompt the unlinked Telegram chats to link a user"
+
+    def handle(self, *args, **options):
+        chats = TelegramAccount.objects.filter(user__isnull=True, is_active=True)
+        with transaction.atomic():
+            tg_ids = list(chats.values_list("id", flat=True))
+            enqueue([("telegram:link-prompt", {"tg_id": tg_id}) for tg_id in tg_ids])
+        self.stdout.write(self.style.SUCCESS(f"Prompted {len(tg_ids)} chats"))
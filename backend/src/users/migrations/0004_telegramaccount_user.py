@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-17 20:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_telegramaccount"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="telegramaccount",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="telegram_accounts",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="User",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_telegramaccount_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="data_version",
+            field=models.BigIntegerField(default=0, verbose_name="Data version"),
+        ),
+    ]
@@ -1,6 +1,7 @@
+import time
 import typing
-from typing import TypeVar
-from uuid import uuid4 as uuid
+from typing import Optional, TypeVar
+from uuid import UUID, uuid4 as uuid
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -8,6 +9,8 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.db import models, transaction
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import base36_to_int, int_to_base36
 from django.utils.translation import gettext_lazy as _
 from core.db.models import DBModel
 
@@ -64,6 +67,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_superuser = models.BooleanField(_("Is superuser"), default=False)
     created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
+    # Bumped whenever the subscriptions change, see `core.conditional`.
+    data_version = models.BigIntegerField(_("Data version"), default=0)
 
     USERNAME_FIELD = "username"
 
@@ -90,8 +95,19 @@ class TokenBlackList(DBModel):
 
 
 class TelegramAccount(DBModel):
+    LINK_SALT = "users.TelegramAccount.link"
+    LINK_MAX_AGE = 15 * 60
+
     id: str = models.BigAutoField(_("Tg ID"), primary_key=True)
     username: str = models.CharField(_("Username"), max_length=255, unique=True)
+    user: models.ForeignKey = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name="telegram_accounts",
+        verbose_name=_("User"),
+        null=True,
+        blank=True,
+    )
     created_at: models.DateTimeField = models.DateTimeField(_("Created at"), auto_now_add=True)
     updated_at: models.DateTimeField = models.DateTimeField(_("Updated at"), auto_now=True)
     is_active: bool = models.BooleanField(_("Is active"), default=True)
@@ -103,3 +119,31 @@ class TelegramAccount(DBModel):
 
     def __str__(self) -> str:
         return f"{self.username}: {self.id}"
+
+    @classmethod
+    def _link_signature(cls, value: str) -> str:
+        return salted_hmac(cls.LINK_SALT, value).hexdigest()[:24]
+
+    @classmethod
+    def link_token(cls, user_id: UUID) -> str:
+        """`/start` payload that links the chat sending it to the user for
+        `LINK_MAX_AGE` seconds, short enough for a Telegram deep link."""
+        value = f"{user_id.hex}{int_to_base36(int(time.time()))}"
+        return f"{value}{cls._link_signature(value)}"
+
+    @classmethod
+    def linked_user_id(cls, token: str) -> Optional[UUID]:
+        """User of a `link_token`, `None` if it was not signed by us or expired."""
+        value, signature = token[:-24], token[-24:]
+        if len(value) <= 32 or not constant_time_compare(
+            signature, cls._link_signature(value)
+        ):
+            return None
+        try:
+            issued_at = base36_to_int(value[32:])
+            user_id = UUID(value[:32])
+        except ValueError:
+            return None
+        if time.time() - issued_at > cls.LINK_MAX_AGE:
+            return None
+        return user_id
@@ -1,21 +1,34 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from loguru import logger
 
-from core.broker import broker
+from core.broker import broker, consumer_limiter
 
 from users.models import TelegramAccount
 
 
 @broker.subscriber(queue="telegram:account:save")
 async def telegram_save_account(data: dict) -> None:
-    print(data)
-    obj, _ = await TelegramAccount.objects.aupdate_or_create(
-        id=data['id'],
-        defaults={
-            "username": data['username'],
-            "created_at": datetime.fromisoformat(data['created_at']),
-            "is_active": data.get('is_active', True)
-        }
-    )
-    print(obj)
+    defaults = {
+        "username": data['username'],
+        "created_at": datetime.fromisoformat(data['created_at']),
+        "is_active": data.get('is_active', True)
+    }
+    # `/start <token>` links the chat to a user, otherwise the link set in the
+    # admin is kept.
+    if data.get('link'):
+        user_id = TelegramAccount.linked_user_id(data['link'])
+        if user_id is None:
+            logger.warning(f"Telegram account id = {data['id']} sent a bad link")
+        else:
+            defaults['user_id'] = user_id
+    async with consumer_limiter.acquire(('telegram', data['id'])):
+        account, _ = await TelegramAccount.objects.aupdate_or_create(
+            id=data['id'],
+            defaults=defaults
+        )
     logger.info(f"Telegram account id = {data['id']} saved")
+    # Only linked chats are notified.
+    if account.user_id is None:
+        await broker.publish(
+            message={'tg_id': account.id}, queue="telegram:link-prompt"
+        )
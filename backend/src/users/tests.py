@@ -1,3 +1,30 @@
-# from django.test import TestCase
+import time
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from users.models import TelegramAccount
+
+
+class TelegramLinkTokenTests(SimpleTestCase):
+    def test_round_trip(self):
+        user_id = uuid4()
+        token = TelegramAccount.link_token(user_id)
+        # Telegram deep link payloads are at most 64 characters.
+        self.assertLessEqual(len(token), 64)
+        self.assertTrue(token.isalnum())
+        self.assertEqual(TelegramAccount.linked_user_id(token), user_id)
+
+    def test_forged_token(self):
+        token = TelegramAccount.link_token(uuid4())
+        other = uuid4().hex
+        for forged in (other + token[32:], token[:-1] + "x", "x", ""):
+            with self.subTest(token=forged):
+                self.assertIsNone(TelegramAccount.linked_user_id(forged))
+
+    def test_expired_token(self):
+        token = TelegramAccount.link_token(uuid4())
+        later = time.time() + TelegramAccount.LINK_MAX_AGE + 1
+        with mock.patch("time.time", return_value=later):
+            self.assertIsNone(TelegramAccount.linked_user_id(token))
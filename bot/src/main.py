@@ -6,7 +6,7 @@ from loguru import logger
 from aiogram import Bot, Dispatcher, html
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandObject, CommandStart
 from aiogram.types import Message
 from faststream.rabbit import RabbitBroker
 
@@ -31,19 +31,26 @@ async def new_post(data: dict) -> None:
     await bot.send_message(chat_id=tg_id, text=text, parse_mode=ParseMode.HTML)
 
 
+@broker.subscriber(queue="telegram:link-prompt")
+async def link_prompt(data: dict) -> None:
+    text = "Open the Telegram link of your profile to get notified of new posts"
+    await bot.send_message(chat_id=data['tg_id'], text=text)
+
+
 @dp.message(CommandStart())
-async def command_start_handler(message: Message) -> None:
+async def command_start_handler(message: Message, command: CommandObject) -> None:
     """
-    This handler receives messages with `/start` command
+    This handler receives messages with `/start` command,
+    `/start <token>` from the link of a user profile links the chat to the user
     """
-    await broker.publish(
-        queue="telegram:account:save",
-        message={
-            "id": message.from_user.id,
-            "username": message.from_user.username,
-            "created_at": message.date.isoformat(),
-        }
-    )
+    account = {
+        "id": message.from_user.id,
+        "username": message.from_user.username,
+        "created_at": message.date.isoformat(),
+    }
+    if command.args:
+        account["link"] = command.args
+    await broker.publish(queue="telegram:account:save", message=account)
     await message.answer(f"Hello, {html.bold(message.from_user.full_name)}!\n")
 
 
@@ -0,0 +1,57 @@
+import asyncio
+from collections import deque
+
+
+class WeightedGate:
+    """Admits crawls from several input lanes while at most `capacity` are in
+    flight. Freed slots go to the lanes with waiting crawls in proportion to
+    their weights (smooth weighted round robin), so a busy low lane can't
+    delay the high lane and the low lane is never starved. The `background`
+    lanes only get the slots no weighted lane is waiting for."""
+
+    def __init__(
+            self,
+            capacity: int,
+            weights: dict[str, int],
+            background: tuple[str, ...] = (),
+    ):
+        self.capacity = capacity
+        self.weights = weights
+        self.background = background
+        self.in_flight = 0
+        self._waiters: dict[str, deque[asyncio.Future]] = {
+            lane: deque() for lane in (*weights, *background)
+        }
+        self._credit = {lane: 0 for lane in weights}
+
+    async def acquire(self, lane: str) -> None:
+        if self.in_flight < self.capacity and not any(self._waiters.values()):
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(waiter)
+        # The slot is handed over by `release` without touching `in_flight`.
+        await waiter
+
+    def release(self) -> None:
+        lane = self._next_lane()
+        if lane is None:
+            self.in_flight -= 1
+        else:
+            self._waiters[lane].popleft().set_result(None)
+
+    def _next_lane(self) -> str | None:
+        # Waiters cancelled while queued are dropped.
+        for waiters in self._waiters.values():
+            while waiters and waiters[0].done():
+                waiters.popleft()
+        waiting = [lane for lane in self.weights if self._waiters[lane]]
+        if not waiting:
+            return next(
+                (lane for lane in self.background if self._waiters[lane]), None
+            )
+        for lane in waiting:
+            self._credit[lane] += self.weights[lane]
+        lane = max(waiting, key=self._credit.__getitem__)
+        self._credit[lane] -= sum(self.weights[i] for i in waiting)
+        return lane
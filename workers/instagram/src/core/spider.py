@@ -8,17 +8,35 @@ from scrapy.exceptions import DontCloseSpider
 from twisted.internet.threads import deferToThread
 from faststream.rabbit import RabbitBroker
 
+from core.lanes import WeightedGate
+
 
 class AioPikaQueueSpider(Spider):
     RMQ_URI: str
     INPUT_QUEUE_NAME: str = None
+    JOB_STATUS_QUEUE_NAME: str = 'crawler:jobs:status'
+    # Input lanes: `low` reads INPUT_QUEUE_NAME, the others
+    # `<INPUT_QUEUE_NAME>:<lane>`.
+    # Weights share the in-flight crawls (3:1 for first crawls while both lanes
+    # wait), priorities order their requests. Backfills are only admitted while
+    # no crawl of new posts waits.
+    LANE_WEIGHTS: dict[str, int] = {'high': 3, 'low': 1}
+    BACKGROUND_LANES: tuple[str, ...] = ('backfill',)
+    LANE_PRIORITIES: dict[str, int] = {'high': 10, 'low': 0, 'backfill': -10}
+    MAX_IN_FLIGHT: int = 16
     broker: RabbitBroker = None
 
     def __init__(self, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
         if not self.INPUT_QUEUE_NAME:
             self.INPUT_QUEUE_NAME = f'crawler:input:{self.name}'
-        self.broker = RabbitBroker(self.RMQ_URI, logger=None)
+        # Messages wait in RabbitMQ instead of in the spider.
+        self.broker = RabbitBroker(
+            self.RMQ_URI, logger=None, max_consumers=self.MAX_IN_FLIGHT
+        )
+        self.gate = WeightedGate(
+            self.MAX_IN_FLIGHT, self.LANE_WEIGHTS, self.BACKGROUND_LANES
+        )
         self.loop = asyncio.get_event_loop()
 
     @classmethod
@@ -29,6 +47,13 @@ class AioPikaQueueSpider(Spider):
 
         # Help unclosed spider to wait for new messages
         crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        # A crawl ends with its result item or an error, see `crawl_finished`.
+        crawler.signals.connect(
+            spider.crawl_finished, signal=signals.item_scraped
+        )
+        crawler.signals.connect(
+            spider.crawl_failed, signal=signals.spider_error
+        )
         return spider
 
     def spider_opened(self) -> None:
@@ -40,12 +65,44 @@ class AioPikaQueueSpider(Spider):
         self.logger.info("Spider is idle, waiting for new messages...")
         raise DontCloseSpider
 
+    def lane_queue(self, lane: str) -> str:
+        if lane == 'low':
+            return self.INPUT_QUEUE_NAME
+        return f'{self.INPUT_QUEUE_NAME}:{lane}'
+
     async def consume_input_queue(self) -> None:
-        self.broker.subscriber(self.INPUT_QUEUE_NAME)(self._callback)
+        for lane in (*self.LANE_WEIGHTS, *self.BACKGROUND_LANES):
+            self.broker.subscriber(self.lane_queue(lane))(self._lane_callback(lane))
+
+    def _lane_callback(self, lane: str):
+        async def callback(data: dict) -> None:
+            await self._callback(data, lane)
+
+        return callback
+
+    def crawl_finished(self, item: Any = None, **kwargs: Any) -> None:
+        # Backfills send a result per page and give the slot back with each,
+        # their next page is admitted again, see `admit`.
+        self.gate.release()
+
+    async def admit(self, request: Request, lane: str) -> None:
+        """Schedule the next request of a crawl once `lane` admits it."""
+        await self.gate.acquire(lane)
+        self.crawler.engine.slot.scheduler.enqueue_request(request)
 
-    async def _callback(self, data: dict) -> None:
+    def crawl_failed(self, failure, response, **kwargs: Any) -> None:
+        metadata = response.meta.get('metadata') or {}
+        self.logger.error(f"Parsing {response.url} failed: {failure.value!r}")
+        self.loop.create_task(self.publish_job_status(metadata, 'failed'))
+        self.crawl_finished()
+
+    async def _callback(self, data: dict, lane: str = 'low') -> None:
         print(data)
+        # Acked only once admitted, the backlog stays in the queue.
+        await self.gate.acquire(lane)
         try:
+            metadata = data.setdefault('metadata', {})
+            metadata['priority'] = self.LANE_PRIORITIES.get(lane, 0)
             name = data.pop('callback', 'start')
             callback = getattr(self, name)
             if inspect.isasyncgenfunction(callback):
@@ -62,6 +119,25 @@ class AioPikaQueueSpider(Spider):
                         raise ValueError('"start" must yield a Request object')
         except Exception as e:
             self.logger.error(f"Error processing message: {e}")
+            self.crawl_finished()
+
+    async def publish_job_status(self, metadata: dict, status: str) -> None:
+        """Report the crawl job of `metadata` to the backend, if it has one."""
+        if not metadata.get('job_id'):
+            return
+        try:
+            await self.broker.publish(
+                {'job_id': metadata['job_id'], 'status': status},
+                queue=self.JOB_STATUS_QUEUE_NAME,
+            )
+        except Exception as e:
+            self.logger.error(f"Error publishing job status: {e}")
+
+    def on_request_error(self, failure) -> None:
+        metadata = failure.request.meta.get('metadata') or {}
+        self.logger.error(f"Request failed: {failure.value!r}")
+        self.loop.create_task(self.publish_job_status(metadata, 'failed'))
+        self.crawl_finished()
 
     def spider_closed(self):
         self.logger.info("Spider closed, closing aio_pika connection.")
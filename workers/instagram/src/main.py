@@ -35,12 +35,15 @@ class InstagramSpider(AioPikaQueueSpider):
         {"username": "nasa", "metadata": {"account_id": 1}}
         """
         self.logger.info(f"Starting request for username: {metadata['username']}")
+        await self.publish_job_status(metadata, 'running')
         metadata['items'] = []
         yield self.make_request_get_posts(
             username=metadata['username'],
             page_size=metadata.get('page_size', 10),
             page_number=1,
             max_pages=metadata.get('max_pages', 1),
+            # Backfills resume from their checkpoint.
+            next_cursor=metadata.get('after'),
             metadata=metadata,
         )
 
@@ -54,20 +57,61 @@ class InstagramSpider(AioPikaQueueSpider):
         data = json.loads(response.text)
         # If the request is not successful, data["data"] will be None
         posts_connection = data["data"]["xdt_api__v1__feed__user_timeline_graphql_connection"]
+        # Newest first, everything past the high-water mark is stored.
+        since = metadata.get('since')
+        backfill = metadata.get('backfill', False)
+        reached_known = False
+        items = []
         for edge in posts_connection.get("edges", []):
             node = edge.get("node")
             if node:
                 parser = self.parser(node, metadata)
+                if parser.is_known(since):
+                    # Pinned posts come first whatever their age.
+                    if parser.is_pinned:
+                        continue
+                    reached_known = True
+                    break
                 item = parser.get_data
-                metadata['items'].append(item.model_dump())
+                items.append(item.model_dump())
+        if not backfill:
+            metadata['items'].extend(items)
 
         # Pagination page
         page_info = posts_connection.get("page_info", {})
+        end_cursor = None
         if page_info.get("has_next_page"):
             end_cursor = page_info.get("end_cursor")
+        next_page = page_number + 1
+        if backfill:
+            # Every page is sent with the cursor of the next one, the backend
+            # stores both at once so an interrupted backfill resumes there.
+            last = not end_cursor or bool(max_pages and next_page > max_pages)
+            yield {
+                **metadata,
+                'items': items,
+                'end_cursor': end_cursor,
+                'last': last,
+            }
+            if not last:
+                # Waits for the background lane like the first page, crawls
+                # of new posts don't wait for the end of a long backfill.
+                request = self.make_request_get_posts(
+                    username=username,
+                    page_size=page_size,
+                    page_number=next_page,
+                    max_pages=max_pages,
+                    next_cursor=end_cursor,
+                    metadata=metadata
+                )
+                self.loop.create_task(self.admit(request, 'backfill'))
+        elif reached_known:
+            self.logger.info(f"Reached known posts of {username}, stopping.")
+            # Sent even without new posts, the backend reschedules the account.
+            yield metadata
+        elif end_cursor:
             variables = response.meta["variables"]
             variables["after"] = end_cursor
-            next_page = page_number + 1
             if max_pages and next_page > max_pages:
                 self.logger.info("Reached max_pages limit, stopping pagination.")
                 yield metadata
@@ -124,6 +168,8 @@ class InstagramSpider(AioPikaQueueSpider):
             method='GET',
             headers=headers,
             callback=self.get_posts,
+            errback=self.on_request_error,
+            priority=(metadata or {}).get('priority', 0),
             dont_filter=True,
             meta={
                 "username": username,
@@ -43,7 +43,8 @@ class PostItemParser(BaseParser):
                 like_count: like_count,
                 usertags: usertags,
                 clips_metadata: clips_metadata,
-                comments: comments
+                comments: comments,
+                timeline_pinned_user_ids: timeline_pinned_user_ids
             }""",
             obj,
         )
@@ -52,6 +53,27 @@ class PostItemParser(BaseParser):
     def id(self) -> str:
         return self.data['id']
 
+    @property
+    def uid(self) -> str:
+        return self.data['id'].split('_')[0]
+
+    @property
+    def is_pinned(self) -> bool:
+        return bool(self.data.get('timeline_pinned_user_ids'))
+
+    def is_known(self, since: Optional[dict]) -> bool:
+        """Whether the post is not newer than the high-water mark `since`.
+        Posts are ordered by `(created_at, media id)` like on the backend, so
+        a post created in the same second as the mark is still new. A post
+        without a timestamp is new."""
+        if not since or self.created_at is None:
+            return False
+        if self.uid == since['uid']:
+            return True
+        # Media ids are compared as numbers, shorter ids are smaller.
+        mark = (since['created_at'], len(since['uid']), since['uid'])
+        return (self.created_at, len(self.uid), self.uid) <= mark
+
     @property
     def title(self) -> str | None:
         return self.data['title']
@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+
+from core.lanes import WeightedGate
+from parser import PostItemParser
+
+
+class WeightedGateTests(unittest.IsolatedAsyncioTestCase):
+    async def admitted(
+            self, gate: WeightedGate, lanes: list[str], count: int
+    ):
+        """Lanes of the first `count` crawls admitted to the full gate."""
+        order = []
+
+        async def crawl(lane):
+            await gate.acquire(lane)
+            order.append(lane)
+
+        tasks = [asyncio.create_task(crawl(lane)) for lane in lanes]
+        await asyncio.sleep(0)
+        for _ in range(count):
+            gate.release()
+            await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        return order
+
+    async def test_admits_up_to_capacity(self):
+        gate = WeightedGate(2, {'high': 3, 'low': 1})
+        await gate.acquire('low')
+        await gate.acquire('low')
+        waiter = asyncio.create_task(gate.acquire('high'))
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        gate.release()
+        await asyncio.sleep(0)
+        self.assertTrue(waiter.done())
+        self.assertEqual(gate.in_flight, 2)
+
+    async def test_shares_slots_by_weight(self):
+        gate = WeightedGate(1, {'high': 3, 'low': 1})
+        await gate.acquire('low')
+        order = await self.admitted(gate, ['high'] * 10 + ['low'] * 10, 8)
+        self.assertEqual(order.count('high'), 6)
+        self.assertEqual(order.count('low'), 2)
+
+    async def test_background_lane_waits_for_weighted_lanes(self):
+        gate = WeightedGate(1, {'high': 3, 'low': 1}, background=('backfill',))
+        await gate.acquire('low')
+        order = await self.admitted(gate, ['backfill', 'low', 'high'], 3)
+        self.assertEqual(order, ['high', 'low', 'backfill'])
+
+    async def test_release_without_waiters_frees_the_slot(self):
+        gate = WeightedGate(1, {'high': 3, 'low': 1})
+        await gate.acquire('high')
+        gate.release()
+        self.assertEqual(gate.in_flight, 0)
+
+
+class IsKnownTests(unittest.TestCase):
+    since = {'uid': '10', 'created_at': 100}
+
+    def is_known(self, post_id: str, created_at: int | None) -> bool:
+        node = {'id': post_id, 'caption': {'created_at': created_at}}
+        return PostItemParser(node, {}).is_known(self.since)
+
+    def test_orders_media_ids_numerically(self):
+        self.assertTrue(self.is_known('9_1', 100))
+        self.assertTrue(self.is_known('10_1', 100))
+        self.assertFalse(self.is_known('11_1', 100))
+
+    def test_orders_by_created_at_first(self):
+        self.assertTrue(self.is_known('99_1', 99))
+        self.assertFalse(self.is_known('1_1', 101))
+
+    def test_post_without_timestamp_is_new(self):
+        self.assertFalse(self.is_known('5_1', None))
+
+
+if __name__ == '__main__':
+    unittest.main()